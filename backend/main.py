@@ -6,11 +6,16 @@ This is an academic simulation for research purposes only.
 Not affiliated with the Election Commission of India.
 """
 
+import asyncio
 import os
-from fastapi import FastAPI
+import re
+from fastapi import BackgroundTasks, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
 # Load environment variables
 load_dotenv()
@@ -18,18 +23,38 @@ load_dotenv()
 # Define allowed origins
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:5173")
 allow_origins = [FRONTEND_URL]
+allow_origin_regex = None
 
-# Add Vercel preview URLs for development flexibility
+# Add Vercel preview URLs for development flexibility.
+# CORSMiddleware compares allow_origins literally, so previews need a regex.
 if "vercel.app" in FRONTEND_URL:
     project_name = FRONTEND_URL.split("https://")[1].split(".vercel.app")[0]
-    allow_origins.extend([
-        f"https://{project_name}-*.vercel.app",
-        f"https://{project_name}.vercel.app"
-    ])
+    allow_origin_regex = rf"^https://{re.escape(project_name)}(-[a-z0-9-]+)?\.vercel\.app$"
 
-from models.database import init_db, seed_database
+from models.database import init_db, seed_database, warm_reference_cache, purge_expired_sessions, invalidate_caches
 from routes import auth_router, voting_router, results_router
 from routes.advanced import router as advanced_router
+from quantum.analytics import voting_analytics
+from utils.ai import gemini_client
+
+
+# How often expired voter sessions are deleted
+SESSION_PURGE_INTERVAL = 300
+
+
+async def _purge_sessions_periodically():
+    """Keep voter_sessions small by deleting expired rows in the background"""
+    while True:
+        await asyncio.sleep(SESSION_PURGE_INTERVAL)
+        if reset_in_progress.is_set():
+            continue
+        try:
+            removed = await run_in_threadpool(purge_expired_sessions)
+        except Exception as e:
+            print(f"⚠️ Session purge failed: {e}")
+            continue
+        if removed:
+            print(f"🧹 Purged {removed} expired voter sessions")
 
 
 @asynccontextmanager
@@ -37,11 +62,15 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print("🚀 Starting Quantum Voting System...")
-    init_db()
+    await run_in_threadpool(init_db)
     await seed_database()
+    await warm_reference_cache()
     print("✅ Database initialized and seeded")
+    purge_task = asyncio.create_task(_purge_sessions_periodically())
     yield
     # Shutdown
+    purge_task.cancel()
+    await gemini_client.aclose()
     print("👋 Shutting down Quantum Voting System...")
 
 
@@ -66,6 +95,7 @@ app = FastAPI(
     """,
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     redoc_url="/api/redoc"
 )
@@ -74,11 +104,16 @@ app = FastAPI(
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allow_origins,
+    allow_origin_regex=allow_origin_regex,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # let browsers cache preflights for a day
 )
 
+# Compress results payloads polled by the dashboard
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
 # Include routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(voting_router, prefix="/api")
@@ -106,20 +141,39 @@ async def health_check():
     return {
         "status": "healthy",
         "quantum_module": "active",
-        "database": "connected"
+        "database": "resetting" if reset_in_progress.is_set() else "connected"
     }
 
 
 
+# Set while a reset is running; /health reports it so clients can poll
+reset_in_progress = asyncio.Event()
+
+
+async def _do_reset():
+    """Drop, recreate and reseed all tables"""
+    from models.database import Base, engine
+    try:
+        print("♻️ Resetting database...")
+        await run_in_threadpool(Base.metadata.drop_all, bind=engine)
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+        await seed_database()
+        await run_in_threadpool(invalidate_caches)
+        await warm_reference_cache()
+        voting_analytics.reset()
+        print("✅ Database reset and seeded")
+    finally:
+        reset_in_progress.clear()
+
+
 @app.get("/api/reset_db")
-async def reset_db():
-    """Force reset database"""
-    print("♻️ Resetting database...")
-    from models.database import Base, engine, seed_database
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    await seed_database()
-    return {"status": "Database reset and seeded with real data"}
+async def reset_db(background_tasks: BackgroundTasks):
+    """Force reset database. Runs after the response; poll /health for completion."""
+    if reset_in_progress.is_set():
+        return {"status": "reset already in progress"}
+    reset_in_progress.set()
+    background_tasks.add_task(_do_reset)
+    return {"status": "reset scheduled"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -10,18 +10,80 @@ Enhanced for:
 """
 
 import json
+import random
 import secrets
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import create_engine, event, select, delete, update, case, text, bindparam, func, and_, or_, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from utils.cache import load_cache_epochs, reference_cache, results_cache
 
 # Database setup
+#
+# SQLite allows a single writer per file, so the pool is shaped around that:
+# one pooled writer connection (checkouts queue instead of fighting over the
+# file lock) and a separate pool of async readers that WAL keeps lock-free
+# against the writer.
 DATABASE_URL = "sqlite:///./quantum_voting.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./quantum_voting.db"
+
+# Per-connection SQLite tuning: WAL lets results reads run alongside vote writes,
+# and synchronous=NORMAL is durable under WAL while skipping the extra fsync.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLite PRAGMAs to every new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+# Both engines get a larger compiled-statement cache than the default 500 so
+# the prebuilt statements below are never evicted and recompiled.
+#
+# Write engine: schema, seeding and the session/vote write paths
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    query_cache_size=1200
+)
+event.listen(engine, "connect", _set_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Read engine: async sessions for the results/read endpoints, so queries
+# await instead of blocking the event loop. aiosqlite defaults to NullPool
+# for file databases; pool explicitly so readers stay warm.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=20,
+    max_overflow=0,
+    query_cache_size=1200
+)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -31,12 +93,17 @@ class Constituency(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    election_type = Column(String(10), nullable=False)  # 'MLA' or 'MP'
+    election_type = Column(String(10), nullable=False, index=True)  # 'MLA' or 'MP'
     district = Column(String(100), nullable=False)
     
-    # Relationships
-    candidates = relationship("Candidate", back_populates="constituency")
-    votes = relationship("Vote", back_populates="constituency")
+    # Relationships. All reads use explicit column selects, so lazy="raise"
+    # turns an accidental per-row relationship load (N+1) into an error
+    candidates = relationship("Candidate", back_populates="constituency", lazy="raise")
+    votes = relationship("Vote", back_populates="constituency", lazy="raise")
+    
+    __table_args__ = (
+        Index("ix_const_district_type", "district", "election_type"),
+    )
 
 
 class Candidate(Base):
@@ -44,7 +111,7 @@ class Candidate(Base):
     __tablename__ = "candidates"
     
     id = Column(Integer, primary_key=True, index=True)
-    constituency_id = Column(Integer, ForeignKey("constituencies.id"), nullable=False)
+    constituency_id = Column(Integer, ForeignKey("constituencies.id"), index=True, nullable=False)
     name = Column(String(100), nullable=False)
     party = Column(String(100), nullable=False)
     party_short = Column(String(20), nullable=False)
@@ -54,8 +121,8 @@ class Candidate(Base):
     votes_2024 = Column(Integer, default=0)  # Actual 2024 election votes
     
     # Relationships
-    constituency = relationship("Constituency", back_populates="candidates")
-    votes = relationship("Vote", back_populates="candidate")
+    constituency = relationship("Constituency", back_populates="candidates", lazy="raise")
+    votes = relationship("Vote", back_populates="candidate", lazy="raise")
 
 
 class Vote(Base):
@@ -63,15 +130,19 @@ class Vote(Base):
     __tablename__ = "votes"
     
     id = Column(Integer, primary_key=True, index=True)
-    constituency_id = Column(Integer, ForeignKey("constituencies.id"), nullable=False)
-    candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False)
+    constituency_id = Column(Integer, ForeignKey("constituencies.id"), index=True, nullable=False)
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), index=True, nullable=False)
     encrypted_vote = Column(Text, nullable=False)
     vote_hash = Column(String(64), unique=True, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, server_default=func.now())
     
     # Relationships
-    constituency = relationship("Constituency", back_populates="votes")
-    candidate = relationship("Candidate", back_populates="votes")
+    constituency = relationship("Constituency", back_populates="votes", lazy="raise")
+    candidate = relationship("Candidate", back_populates="votes", lazy="raise")
+    
+    __table_args__ = (
+        Index("ix_vote_const_cand", "constituency_id", "candidate_id"),
+    )
 
 
 class VoterSession(Base):
@@ -85,7 +156,7 @@ class VoterSession(Base):
     has_voted_mla = Column(Boolean, default=False)
     has_voted_mp = Column(Boolean, default=False)
     quantum_key = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now())
     expires_at = Column(DateTime, nullable=True)
 
 
@@ -98,7 +169,11 @@ class QuantumChannelLog(Base):
     error_rate = Column(String(10), nullable=False)
     eavesdropping_detected = Column(Boolean, default=False)
     channel_secure = Column(Boolean, default=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_qcl_timestamp", timestamp.desc()),
+    )
 
 
 class District(Base):
@@ -116,14 +191,98 @@ class District(Base):
     leading_party_color = Column(String(20), nullable=True)
 
 
+class PartyTotal(Base):
+    """Running vote total per party and election type, kept by a trigger on votes"""
+    __tablename__ = "party_totals"
+    
+    election_type = Column(String(10), primary_key=True)
+    party = Column(String(20), primary_key=True)
+    color = Column(String(20), nullable=True)
+    votes = Column(Integer, nullable=False, default=0)
+
+
+class CacheEpoch(Base):
+    """Single row of cache epochs, shared by every worker process (see utils.cache)"""
+    __tablename__ = "cache_epochs"
+    
+    id = Column(Integer, primary_key=True)
+    results = Column(Integer, nullable=False)
+    reference = Column(Integer, nullable=False)
+
+
+# Every inserted vote bumps its party's total, so party-wise results and
+# turnout read a handful of rows instead of scanning votes
+PARTY_TOTALS_TRIGGER_SQL = text("""
+    CREATE TRIGGER IF NOT EXISTS trg_votes_party_totals AFTER INSERT ON votes
+    BEGIN
+        INSERT INTO party_totals (election_type, party, color, votes)
+        SELECT c.election_type, cand.party_short, cand.party_color, 1
+        FROM candidates cand JOIN constituencies c ON c.id = NEW.constituency_id
+        WHERE cand.id = NEW.candidate_id
+        ON CONFLICT (election_type, party) DO UPDATE SET votes = votes + 1;
+    END
+""")
+
+PARTY_TOTALS_BACKFILL_SQL = text("""
+    INSERT INTO party_totals (election_type, party, color, votes)
+    SELECT c.election_type, cand.party_short, MAX(cand.party_color), COUNT(v.id)
+    FROM votes v
+    JOIN candidates cand ON cand.id = v.candidate_id
+    JOIN constituencies c ON c.id = v.constituency_id
+    GROUP BY c.election_type, cand.party_short
+""")
+
+
+# Every inserted vote also moves the results epoch, in the same transaction
+RESULTS_EPOCH_TRIGGER_SQL = text("""
+    CREATE TRIGGER IF NOT EXISTS trg_votes_results_epoch AFTER INSERT ON votes
+    BEGIN
+        UPDATE cache_epochs SET results = results + 1 WHERE id = 1;
+    END
+""")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_party_totals_trigger(target, connection, tables=(), **kw):
+    connection.execute(PARTY_TOTALS_TRIGGER_SQL)
+    # A database created before party_totals existed may already hold votes
+    if PartyTotal.__table__ in tables:
+        connection.execute(PARTY_TOTALS_BACKFILL_SQL)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_cache_epochs(target, connection, tables=(), **kw):
+    # Random starting points, so a recreated table never repeats epochs that
+    # other workers still hold cache entries for
+    if CacheEpoch.__table__ in tables:
+        connection.execute(CacheEpoch.__table__.insert().values(
+            id=1, results=secrets.randbits(48), reference=secrets.randbits(48)
+        ))
+    connection.execute(RESULTS_EPOCH_TRIGGER_SQL)
+
+
 # Create all tables
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add any indexes
+    # introduced after an existing database was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+async def get_db():
+    """Get a request-scoped async database session (FastAPI dependency)"""
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
-def get_db():
-    """Get database session"""
+def get_write_db():
+    """
+    Get a request-scoped session on the write engine (FastAPI dependency).
+    Use from plain `def` handlers so the blocking calls run in the threadpool.
+    """
     db = SessionLocal()
     try:
         yield db
@@ -131,365 +290,682 @@ def get_db():
         db.close()
 
 
+def invalidate_caches():
+    """Bump both cache epochs so every worker drops its cached results and reference data"""
+    with SessionLocal() as db:
+        db.execute(BUMP_CACHE_EPOCHS)
+        db.commit()
+
+
+def purge_expired_sessions() -> int:
+    """Delete voter sessions past their expiry; returns the number removed"""
+    with SessionLocal() as db:
+        result = db.execute(
+            delete(VoterSession).where(VoterSession.expires_at < datetime.utcnow())
+        )
+        db.commit()
+        return result.rowcount
+
+
 async def seed_database():
-    """Seed database with real 2024 AP election data"""
-    db = SessionLocal()
+    """
+    Seed database with real 2024 AP election data.
+    Idempotent: existing rows are skipped by SQLite (INSERT OR IGNORE) and
+    candidates are only generated for constituencies that have none yet.
+    """
+    # Load data files
+    data_path = Path(__file__).parent.parent / "data" / "constituencies.json"
+    candidates_path = Path(__file__).parent.parent / "data" / "candidates.json"
     
-    try:
-        # Check if already seeded
-        if db.query(Constituency).count() > 0:
-            print("Database already seeded")
-            return
-        
-        # Load data files
-        data_path = Path(__file__).parent.parent / "data" / "constituencies.json"
-        candidates_path = Path(__file__).parent.parent / "data" / "candidates.json"
-        
-        with open(data_path, 'r', encoding='utf-8') as f:
-            constituency_data = json.load(f)
-        
-        with open(candidates_path, 'r', encoding='utf-8') as f:
-            candidate_data = json.load(f)
-        
-        # Create party lookup
-        parties = {p['short']: p for p in candidate_data['parties']}
-        real_mla_candidates = candidate_data.get('mla_candidates_2024', {})
-        real_mp_candidates = candidate_data.get('mp_candidates_2024', {})
-        districts_info = candidate_data.get('districts', {})
-        
-        # Seed districts
-        for district_name, info in districts_info.items():
-            district = District(
-                name=district_name,
-                lat=info.get('lat'),
-                lng=info.get('lng'),
-                mla_count=info.get('mla_count', 0),
-                mp_count=info.get('mp_count', 0)
-            )
-            db.add(district)
+    with open(data_path, 'r', encoding='utf-8') as f:
+        constituency_data = json.load(f)
+    
+    with open(candidates_path, 'r', encoding='utf-8') as f:
+        candidate_data = json.load(f)
+    
+    # Create party lookup
+    parties = {p['short']: p for p in candidate_data['parties']}
+    real_mla_candidates = candidate_data.get('mla_candidates_2024', {})
+    real_mp_candidates = candidate_data.get('mp_candidates_2024', {})
+    districts_info = candidate_data.get('districts', {})
+    
+    district_rows = [
+        {
+            "name": district_name,
+            "lat": info.get('lat'),
+            "lng": info.get('lng'),
+            "mla_count": info.get('mla_count', 0),
+            "mp_count": info.get('mp_count', 0)
+        }
+        for district_name, info in districts_info.items()
+    ]
+    # MP constituency IDs are offset by 200
+    constituency_rows = [
+        {"id": c['id'], "name": c['name'], "election_type": 'MLA', "district": c['district']}
+        for c in constituency_data['mla_constituencies']
+    ] + [
+        {"id": 200 + c['id'], "name": c['name'], "election_type": 'MP', "district": c['district']}
+        for c in constituency_data['mp_constituencies']
+    ]
+    
+    def load_seeded_ids():
+        with engine.connect() as conn:
+            return set(conn.execute(
+                select(Candidate.constituency_id).distinct()
+            ).scalars())
+    
+    # Writes stay on the single-connection sync engine; run its blocking
+    # calls in the threadpool so a reset does not stall the event loop
+    seeded_ids = await run_in_threadpool(load_seeded_ids)
+    
+    pending = [c for c in constituency_rows if c['id'] not in seeded_ids]
+    if not pending:
+        print("Database already seeded")
+        return
+    
+    candidate_rows = []
+    
+    # Resolve each party's display fields once; the candidate loop only unpacks
+    party_cache = {
+        short: (p['name'], p['symbol'], p.get('color', '#9E9E9E'), p.get('logo_url'))
+        for short, p in parties.items()
+    }
+    default_party = party_cache['IND']
+    
+    def add_candidate(const_id: int, name: str, party_short: str, votes_2024: int = 0):
+        party_name, symbol, color, logo_url = party_cache.get(party_short, default_party)
+        candidate_rows.append({
+            "constituency_id": const_id,
+            "name": name,
+            "party": party_name,
+            "party_short": party_short,
+            "symbol": symbol,
+            "party_color": color,
+            "logo_url": logo_url,
+            "votes_2024": votes_2024
+        })
+    
+    # Synthetic names are not security sensitive: seed a fast PRNG once from
+    # the OS and draw every fallback name up front instead of per candidate.
+    rng = random.Random(secrets.randbits(64))
+    alliance_parties = ['TDP', 'JSP', 'BJP']
+    name_parts = {
+        'MLA': (
+            ["Venkata", "Krishna", "Ram", "Siva", "Narayana", "Lakshmi", "Srinivas", "Rao", "Reddy", "Naidu"],
+            ["Rao", "Reddy", "Naidu", "Chowdary", "Goud", "Setty", "Varma"]
+        ),
+        'MP': (
+            ["Venkata", "Krishna", "Ram", "Siva", "Narayana", "Lakshmi", "Srinivas", "Subba"],
+            ["Raju", "Reddy", "Naidu", "Chowdary", "Goud", "Setty", "Varma"]
+        )
+    }
+    pool_size = 3 * len(pending)
+    name_pools = {
+        election_type: iter([
+            f"{prefix} {suffix}"
+            for prefix, suffix in zip(rng.choices(prefixes, k=pool_size),
+                                      rng.choices(suffixes, k=pool_size))
+        ])
+        for election_type, (prefixes, suffixes) in name_parts.items()
+    }
+    
+    def real_candidates_for(const):
+        real_candidates = (
+            real_mla_candidates if const['election_type'] == 'MLA' else real_mp_candidates
+        )
+        return real_candidates.get(const['name'])
+    
+    # Pick parties for constituencies without real data first, so every AI
+    # name request can be sent together.
+    # Alliance logic: TDP, JSP, BJP vs YSRCP. In 2024, TDP+JSP+BJP alliance
+    # meant usually only one of them contested
+    synthetic_parties = {
+        const['id']: [rng.choice(alliance_parties), 'YSRCP', 'INC']
+        for const in pending
+        if real_candidates_for(const) is None
+    }
+    
+    # Use AI to generate realistic MLA candidates if API key is present
+    # Fallback to static names if AI fails or key is missing
+    from utils.ai import gemini_client
+    
+    ai_names = {}
+    ai_requests = [
+        const for const in pending
+        if const['id'] in synthetic_parties and const['election_type'] == 'MLA'
+    ]
+    if gemini_client.api_key and ai_requests:
+        results = await gemini_client.generate_candidate_names_bulk(
+            [(const['name'], synthetic_parties[const['id']]) for const in ai_requests]
+        )
+        ai_names = {const['id']: names for const, names in zip(ai_requests, results) if names}
+    
+    for const in pending:
+        # Check if we have real candidate data for this constituency
+        real_candidates = real_candidates_for(const)
+        if real_candidates is not None:
+            for cand in real_candidates:
+                add_candidate(const['id'], cand['name'], cand['party'], cand.get('votes_2024', 0))
+            continue
         
-        # Seed MLA constituencies with real candidates where available
-        for const in constituency_data['mla_constituencies']:
-            constituency = Constituency(
-                id=const['id'],
-                name=const['name'],
-                election_type='MLA',
-                district=const['district']
-            )
-            db.add(constituency)
-            db.flush()
-            
-            # Check if we have real candidate data for this constituency
-            # If not, and we have API key, try to fetch some
-            if const['name'] in real_mla_candidates:
-                for cand in real_mla_candidates[const['name']]:
-                    party = parties.get(cand['party'], parties['IND'])
-                    candidate = Candidate(
-                        constituency_id=constituency.id,
-                        name=cand['name'],
-                        party=party['name'],
-                        party_short=cand['party'],
-                        symbol=party['symbol'],
-                        party_color=party.get('color', '#9E9E9E'),
-                        logo_url=party.get('logo_url'),
-                        votes_2024=cand.get('votes_2024', 0)
-                    )
-                    db.add(candidate)
-            else:
-                # Use AI to generate realistic candidates if API key is present
-                # Fallback to alliance logic if AI fails or key is missing
-                from utils.ai import gemini_client
-                
-                # Check for alliance logic: TDP, JSP, BJP vs YSRCP
-                # In 2024, TDP+JSP+BJP alliance meant usually only one of them contested
-                
-                alliance_parties = ['TDP', 'JSP', 'BJP']
-                alliance_choice = secrets.choice(alliance_parties)
-                candidates_to_add = [alliance_choice, 'YSRCP', 'INC']
-                
-                ai_candidates = []
-                if gemini_client.api_key:
-                    try:
-                        # Fetch realistic names from Gemini for this constituency
-                        ai_names = await gemini_client.generate_candidate_names(const['name'], candidates_to_add)
-                        if ai_names:
-                            ai_candidates = ai_names
-                    except Exception as e:
-                        print(f"AI generation failed for {const['name']}: {e}")
-
-                for i, party_short in enumerate(candidates_to_add):
-                    if party_short not in parties:
-                        continue
-                    party = parties[party_short]
-                    
-                    # Use AI name if available, else static random
-                    if i < len(ai_candidates):
-                        cand_name = ai_candidates[i]
-                    else:
-                        names_prefix = ["Venkata", "Krishna", "Ram", "Siva", "Narayana", "Lakshmi", "Srinivas", "Rao", "Reddy", "Naidu"]
-                        name_suffix = ["Rao", "Reddy", "Naidu", "Chowdary", "Goud", "Setty", "Varma"]
-                        cand_name = f"{secrets.choice(names_prefix)} {secrets.choice(name_suffix)}"
-                    
-                    candidate = Candidate(
-                        constituency_id=constituency.id,
-                        name=cand_name,
-                        party=party['name'],
-                        party_short=party_short,
-                        symbol=party['symbol'],
-                        party_color=party.get('color', '#9E9E9E'),
-                        logo_url=party.get('logo_url')
-                    )
-                    db.add(candidate)
+        ai_candidates = ai_names.get(const['id'], [])
+        names = name_pools[const['election_type']]
         
-        # Seed MP constituencies (offset IDs by 200)
-        for const in constituency_data['mp_constituencies']:
-            constituency = Constituency(
-                id=200 + const['id'],
-                name=const['name'],
-                election_type='MP',
-                district=const['district']
-            )
-            db.add(constituency)
-            db.flush()
+        for i, party_short in enumerate(synthetic_parties[const['id']]):
+            if party_short not in parties:
+                continue
             
-            # Check if we have real candidate data
-            if const['name'] in real_mp_candidates:
-                for cand in real_mp_candidates[const['name']]:
-                    party = parties.get(cand['party'], parties['IND'])
-                    candidate = Candidate(
-                        constituency_id=constituency.id,
-                        name=cand['name'],
-                        party=party['name'],
-                        party_short=cand['party'],
-                        symbol=party['symbol'],
-                        party_color=party.get('color', '#9E9E9E'),
-                        logo_url=party.get('logo_url'),
-                        votes_2024=cand.get('votes_2024', 0)
-                    )
-                    db.add(candidate)
+            # Use AI name if available, else static random
+            if i < len(ai_candidates):
+                cand_name = ai_candidates[i]
             else:
-                # Alliance Logic for MPs
-                alliance_parties = ['TDP', 'JSP', 'BJP']
-                alliance_choice = secrets.choice(alliance_parties)
-                candidates_to_add = [alliance_choice, 'YSRCP', 'INC']
-
-                for party_short in candidates_to_add:
-                    if party_short not in parties:
-                        continue
-                    party = parties[party_short]
-                    
-                    # Realistic Names
-                    names_prefix = ["Venkata", "Krishna", "Ram", "Siva", "Narayana", "Lakshmi", "Srinivas", "Subba"]
-                    name_suffix = ["Raju", "Reddy", "Naidu", "Chowdary", "Goud", "Setty", "Varma"]
-                    cand_name = f"{secrets.choice(names_prefix)} {secrets.choice(name_suffix)}"
-
-                    candidate = Candidate(
-                        constituency_id=constituency.id,
-                        name=cand_name,
-                        party=party['name'],
-                        party_short=party_short,
-                        symbol=party['symbol'],
-                        party_color=party.get('color', '#9E9E9E'),
-                        logo_url=party.get('logo_url')
-                    )
-                    db.add(candidate)
-        
-        db.commit()
-        print(f"Seeded {db.query(Constituency).count()} constituencies, "
-              f"{db.query(Candidate).count()} candidates, "
-              f"{db.query(District).count()} districts")
-        
+                cand_name = next(names)
+            add_candidate(const['id'], cand_name, party_short)
+    
+    def write_rows():
+        # Everything is written in one transaction with a single commit;
+        # IDs come from the JSON, so nothing needs flushing to get keys
+        with engine.begin() as conn:
+            districts_added = conn.execute(
+                District.__table__.insert().prefix_with("OR IGNORE"), district_rows
+            ).rowcount
+            constituencies_added = conn.execute(
+                Constituency.__table__.insert().prefix_with("OR IGNORE"), constituency_rows
+            ).rowcount
+            conn.execute(Candidate.__table__.insert(), candidate_rows)
+        return districts_added, constituencies_added
+    
+    try:
+        districts_added, constituencies_added = await run_in_threadpool(write_rows)
     except Exception as e:
-        db.rollback()
         print(f"Error seeding database: {e}")
         raise
-    finally:
-        db.close()
-
-
-def get_constituencies_by_type(election_type: str) -> List[dict]:
+    
+    print(f"Seeded {constituencies_added} constituencies, "
+          f"{len(candidate_rows)} candidates, "
+          f"{districts_added} districts")
+
+
+# Hot read statements are built once at import; callers only bind parameters,
+# so per-request work skips Query construction and hits the compiled cache.
+# Columns are labelled with their response keys so rows map straight to dicts.
+CONSTITUENCIES_BY_TYPE = select(
+    Constituency.id,
+    Constituency.name,
+    Constituency.district,
+    Constituency.election_type
+).where(Constituency.election_type == bindparam("election_type"))
+
+CONSTITUENCY_BY_ID = select(
+    Constituency.id,
+    Constituency.name,
+    Constituency.district,
+    Constituency.election_type
+).where(Constituency.id == bindparam("constituency_id"))
+
+CONSTITUENCIES_BY_DISTRICT = select(
+    Constituency.id,
+    Constituency.name,
+    Constituency.district
+).where(
+    Constituency.district == bindparam("district"),
+    Constituency.election_type == bindparam("election_type")
+)
+
+# Fallback choices when a district has no constituencies of a type
+CONSTITUENCIES_FALLBACK = select(
+    Constituency.id,
+    Constituency.name,
+    Constituency.district
+).where(Constituency.election_type == bindparam("election_type")).limit(bindparam("limit"))
+
+def _ballot_statement(voted, constituency_id):
+    return select(
+        VoterSession.expires_at,
+        VoterSession.quantum_key,
+        voted.label("already_voted"),
+        constituency_id.label("constituency_id"),
+        Candidate.id.is_not(None).label("candidate_ok")
+    ).outerjoin(
+        Candidate,
+        and_(Candidate.id == bindparam("candidate_id"), Candidate.constituency_id == constituency_id)
+    ).where(VoterSession.session_id == bindparam("session_id"))
+
+
+# Session state plus candidate check for cast_vote, one statement per election type
+BALLOT_BY_TYPE = {
+    'MLA': _ballot_statement(VoterSession.has_voted_mla, VoterSession.mla_constituency_id),
+    'MP': _ballot_statement(VoterSession.has_voted_mp, VoterSession.mp_constituency_id)
+}
+
+CANDIDATES_BY_CONSTITUENCY = select(
+    Candidate.id,
+    Candidate.name,
+    Candidate.party,
+    Candidate.party_short,
+    Candidate.symbol,
+    Candidate.party_color,
+    Candidate.logo_url,
+    Candidate.votes_2024
+).where(Candidate.constituency_id == bindparam("constituency_id"))
+
+ALL_CONSTITUENCIES = select(
+    Constituency.id,
+    Constituency.name,
+    Constituency.district,
+    Constituency.election_type
+)
+
+ALL_CANDIDATES = select(
+    Candidate.constituency_id,
+    *CANDIDATES_BY_CONSTITUENCY.selected_columns
+).order_by(Candidate.id)
+
+VOTE_COUNTS_BY_CONSTITUENCY = select(
+    Candidate.id.label('candidate_id'),
+    Candidate.name.label('candidate_name'),
+    Candidate.party_short.label('party'),
+    Candidate.party_color,
+    func.count(Vote.id).label('votes')
+).outerjoin(Vote, Vote.candidate_id == Candidate.id).where(
+    Candidate.constituency_id == bindparam("constituency_id")
+).group_by(Candidate.id)
+
+# Candidates that received votes, for every constituency of one election type
+VOTE_COUNTS_BY_TYPE = select(
+    Vote.constituency_id,
+    Candidate.id.label('candidate_id'),
+    Candidate.name.label('candidate_name'),
+    Candidate.party_short.label('party'),
+    Candidate.party_color,
+    func.count(Vote.id).label('votes')
+).join(Candidate, Vote.candidate_id == Candidate.id).join(
+    Constituency, Vote.constituency_id == Constituency.id
+).where(
+    Constituency.election_type == bindparam("election_type")
+).group_by(Vote.constituency_id, Candidate.id).order_by(Vote.constituency_id, Candidate.id)
+
+TOTAL_VOTES_BY_TYPE = select(func.coalesce(func.sum(PartyTotal.votes), 0)).where(
+    PartyTotal.election_type == bindparam("election_type")
+)
+
+PARTY_WISE_RESULTS = select(
+    PartyTotal.party,
+    PartyTotal.color,
+    PartyTotal.votes
+).where(
+    PartyTotal.election_type == bindparam("election_type")
+).order_by(PartyTotal.votes.desc())
+
+VOTES_BY_DISTRICT = select(
+    Constituency.district,
+    func.count(Vote.id)
+).join(Vote, Vote.constituency_id == Constituency.id).group_by(Constituency.district)
+
+# Votes per hour of the (UTC) timestamp, the hour formatted as "YYYY-MM-DD HH"
+_VOTE_HOUR = func.strftime("%Y-%m-%d %H", Vote.timestamp)
+HOURLY_VOTE_COUNTS = select(
+    _VOTE_HOUR,
+    func.count(Vote.id)
+).where(Vote.timestamp.is_not(None)).group_by(_VOTE_HOUR)
+
+CACHE_EPOCHS = select(CacheEpoch.results, CacheEpoch.reference).where(CacheEpoch.id == 1)
+
+BUMP_CACHE_EPOCHS = update(CacheEpoch).where(CacheEpoch.id == 1).values(
+    results=CacheEpoch.results + 1,
+    reference=CacheEpoch.reference + 1
+)
+
+# Health probe counts in one round trip; "active" sessions have not cast both votes
+HEALTH_COUNTS = select(
+    select(func.count()).select_from(Vote).scalar_subquery(),
+    select(func.count()).select_from(VoterSession).where(
+        or_(VoterSession.has_voted_mla == False, VoterSession.has_voted_mp == False)
+    ).scalar_subquery(),
+    select(func.count()).select_from(QuantumChannelLog).scalar_subquery()
+)
+
+
+# Reference data (districts, constituencies, candidates) only changes on
+# reseed, so these lookups are cached for minutes rather than seconds.
+# The sync variants serve the write-path handlers that run in the threadpool.
+
+@reference_cache()
+async def get_all_districts(db: AsyncSession) -> List[dict]:
+    """Get all districts with map coordinates and seat counts"""
+    result = await db.execute(select(
+        District.name, District.lat, District.lng, District.mla_count, District.mp_count
+    ))
+    return [dict(r) for r in result.mappings().all()]
+
+
+@reference_cache()
+async def get_constituency(db: AsyncSession, constituency_id: int) -> Optional[dict]:
+    """Get a constituency by id"""
+    row = (await db.execute(CONSTITUENCY_BY_ID, {"constituency_id": constituency_id})).mappings().first()
+    return dict(row) if row else None
+
+
+@reference_cache()
+def load_constituency(db: Session, constituency_id: int) -> Optional[dict]:
+    """Get a constituency by id (sync)"""
+    row = db.execute(CONSTITUENCY_BY_ID, {"constituency_id": constituency_id}).mappings().first()
+    return dict(row) if row else None
+
+
+def load_ballot(db: Session, session_id: str, candidate_id: int, election_type: str):
+    """
+    Load everything cast_vote checks in one joined query (sync).
+    Returns None for an unknown session, otherwise a row of
+    (expires_at, quantum_key, already_voted, constituency_id, candidate_ok).
+    """
+    return db.execute(
+        BALLOT_BY_TYPE[election_type],
+        {"session_id": session_id, "candidate_id": candidate_id}
+    ).first()
+
+
+# Duplicate-safe vote insert: a repeated vote_hash inserts nothing and returns no id
+INSERT_VOTE = sqlite_insert(Vote).on_conflict_do_nothing(
+    index_elements=[Vote.vote_hash]
+).returning(Vote.id)
+
+
+def _mark_voted_statement(voted, other_voted):
+    # The voted flag in the WHERE makes a repeat cast match no row, and the
+    # quantum key is cleared in SQL once both votes are in
+    return update(VoterSession).where(
+        VoterSession.session_id == bindparam("b_session_id"),
+        voted == False
+    ).values({
+        voted: True,
+        VoterSession.quantum_key: case((other_voted == True, None), else_=VoterSession.quantum_key)
+    }).returning(other_voted).execution_options(synchronize_session=False)
+
+
+MARK_VOTED_BY_TYPE = {
+    'MLA': _mark_voted_statement(VoterSession.has_voted_mla, VoterSession.has_voted_mp),
+    'MP': _mark_voted_statement(VoterSession.has_voted_mp, VoterSession.has_voted_mla)
+}
+
+
+def insert_vote(db: Session, **values) -> Optional[int]:
+    """Insert a vote; returns its id, or None if the vote_hash already exists"""
+    return db.execute(INSERT_VOTE, values).scalar()
+
+
+def mark_session_voted(db: Session, session_id: str, election_type: str) -> Optional[bool]:
+    """
+    Flag the session as having voted for election_type.
+    Returns whether the other election is also done, or None if the session
+    had already voted for this one.
+    """
+    return db.execute(MARK_VOTED_BY_TYPE[election_type], {"b_session_id": session_id}).scalar()
+
+
+@reference_cache()
+def load_district_constituencies(db: Session, district: str) -> tuple:
+    """
+    Get the (MLA, MP) constituencies offered to a voter in a district (sync).
+    Falls back to the first few of each type if the district has none.
+    """
+    def by_type(election_type, fallback_limit):
+        rows = db.execute(
+            CONSTITUENCIES_BY_DISTRICT, {"district": district, "election_type": election_type}
+        ).mappings().all()
+        if not rows:
+            rows = db.execute(
+                CONSTITUENCIES_FALLBACK, {"election_type": election_type, "limit": fallback_limit}
+            ).mappings().all()
+        return [dict(r) for r in rows]
+
+    return by_type('MLA', 5), by_type('MP', 3)
+
+
+@reference_cache()
+async def get_constituencies_by_type(db: AsyncSession, election_type: str) -> List[dict]:
     """Get all constituencies by election type (MLA/MP)"""
-    db = SessionLocal()
-    try:
-        constituencies = db.query(Constituency).filter(
-            Constituency.election_type == election_type
-        ).all()
-        return [
-            {
-                "id": c.id,
-                "name": c.name,
-                "district": c.district,
-                "election_type": c.election_type
-            }
-            for c in constituencies
-        ]
-    finally:
-        db.close()
+    result = await db.execute(CONSTITUENCIES_BY_TYPE, {"election_type": election_type})
+    return [dict(r) for r in result.mappings().all()]
 
 
-def get_candidates_by_constituency(constituency_id: int) -> List[dict]:
+@reference_cache()
+async def get_candidates_by_constituency(db: AsyncSession, constituency_id: int) -> List[dict]:
     """Get all candidates for a constituency"""
-    db = SessionLocal()
-    try:
-        candidates = db.query(Candidate).filter(
-            Candidate.constituency_id == constituency_id
-        ).all()
-        return [
-            {
-                "id": c.id,
-                "name": c.name,
-                "party": c.party,
-                "party_short": c.party_short,
-                "symbol": c.symbol,
-                "party_color": c.party_color,
-                "logo_url": c.logo_url,
-                "votes_2024": c.votes_2024
-            }
-            for c in candidates
-        ]
-    finally:
-        db.close()
+    result = await db.execute(CANDIDATES_BY_CONSTITUENCY, {"constituency_id": constituency_id})
+    return [dict(r) for r in result.mappings().all()]
+
+
+async def warm_reference_cache():
+    """
+    Prefill the reference caches at startup so the first voters do not
+    pay for them: two bulk selects fill every per-constituency entry.
+    """
+    async with AsyncSessionLocal() as db:
+        await load_cache_epochs(db)
+        constituencies = (await db.execute(ALL_CONSTITUENCIES)).mappings().all()
+        candidates_by_const = defaultdict(list)
+        for row in (await db.execute(ALL_CANDIDATES)).mappings():
+            candidate = dict(row)
+            candidates_by_const[candidate.pop("constituency_id")].append(candidate)
+        
+        for row in constituencies:
+            constituency = dict(row)
+            get_constituency.prime(db, constituency, constituency["id"])
+            load_constituency.prime(db, constituency, constituency["id"])
+            get_candidates_by_constituency.prime(db, candidates_by_const[constituency["id"]], constituency["id"])
+        
+        await get_all_districts(db)
+        for election_type in ('MLA', 'MP'):
+            await get_constituencies_by_type(db, election_type)
 
 
-def get_vote_counts_by_constituency(constituency_id: int) -> list:
+async def get_vote_counts_by_constituency(db: AsyncSession, constituency_id: int) -> list:
     """Get vote counts for all candidates in a constituency"""
-    db = SessionLocal()
-    try:
-        from sqlalchemy import func
-        
-        results = db.query(
-            Candidate.id,
-            Candidate.name,
-            Candidate.party_short,
-            Candidate.party_color,
-            func.count(Vote.id).label('vote_count')
-        ).outerjoin(Vote).filter(
-            Candidate.constituency_id == constituency_id
-        ).group_by(Candidate.id).all()
-        
-        return [
-            {
-                "candidate_id": r[0],
-                "candidate_name": r[1],
-                "party": r[2],
-                "party_color": r[3],
-                "votes": r[4]
-            }
-            for r in results
-        ]
-    finally:
-        db.close()
+    result = await db.execute(VOTE_COUNTS_BY_CONSTITUENCY, {"constituency_id": constituency_id})
+    return [dict(r) for r in result.mappings().all()]
+
 
+async def get_vote_counts_bulk(db: AsyncSession, election_type: str) -> dict:
+    """
+    Get vote counts for every constituency of an election type in one query.
+    Maps constituency_id -> rows shaped like get_vote_counts_by_constituency,
+    but only for candidates with votes.
+    """
+    counts = {}
+    result = await db.execute(VOTE_COUNTS_BY_TYPE, {"election_type": election_type})
+    for row in result.mappings():
+        row = dict(row)
+        counts.setdefault(row.pop('constituency_id'), []).append(row)
+    return counts
 
-def get_total_votes_by_type(election_type: str) -> int:
+
+async def get_total_votes_by_type(db: AsyncSession, election_type: str) -> int:
     """Get total votes cast for an election type"""
-    db = SessionLocal()
-    try:
-        return db.query(Vote).join(Constituency).filter(
-            Constituency.election_type == election_type
-        ).count()
-    finally:
-        db.close()
+    return (await db.execute(TOTAL_VOTES_BY_TYPE, {"election_type": election_type})).scalar_one()
 
 
-def get_party_wise_results(election_type: str) -> List[dict]:
-    """Get party-wise vote totals for an election type"""
-    db = SessionLocal()
-    try:
-        from sqlalchemy import func
-        
-        results = db.query(
-            Candidate.party_short,
-            Candidate.party_color,
-            func.count(Vote.id).label('total_votes')
-        ).join(Vote).join(Constituency).filter(
-            Constituency.election_type == election_type
-        ).group_by(Candidate.party_short, Candidate.party_color).order_by(
-            func.count(Vote.id).desc()
-        ).all()
-        
-        return [
-            {"party": r[0], "color": r[1], "votes": r[2]}
-            for r in results
-        ]
-    finally:
-        db.close()
+@results_cache(ttl=1, maxsize=1)
+async def get_votes_by_district(db: AsyncSession) -> dict:
+    """Get total votes per district (districts without votes are omitted)"""
+    return dict((await db.execute(VOTES_BY_DISTRICT)).all())
+
+
+@results_cache(ttl=1, maxsize=1)
+async def get_hourly_vote_counts(db: AsyncSession) -> dict:
+    """Get total votes per hour, keyed by "YYYY-MM-DD HH" """
+    return dict((await db.execute(HOURLY_VOTE_COUNTS)).all())
 
 
-def get_district_vote_summary() -> List[dict]:
+@results_cache(ttl=2, maxsize=1)
+async def get_health_counts(db: AsyncSession) -> dict:
+    """Get vote, active session and quantum log counts for health checks"""
+    total_votes, active_sessions, quantum_logs = (await db.execute(HEALTH_COUNTS)).one()
+    return {
+        "total_votes": total_votes,
+        "active_sessions": active_sessions,
+        "quantum_logs": quantum_logs
+    }
+
+
+@results_cache()
+async def get_party_wise_results(db: AsyncSession, election_type: str) -> List[dict]:
+    """Get party-wise vote totals for an election type"""
+    result = await db.execute(PARTY_WISE_RESULTS, {"election_type": election_type})
+    return [dict(r) for r in result.mappings().all()]
+
+
+# Every admin dashboard aggregate as columns of a single row
+DASHBOARD_COUNTS_SQL = text("""
+    SELECT
+        (SELECT COUNT(*) FROM constituencies) AS total_constituencies,
+        (SELECT COUNT(*) FROM candidates) AS total_candidates,
+        (SELECT COUNT(*) FROM votes) AS total_votes,
+        (SELECT COUNT(*) FROM constituencies WHERE election_type = 'MLA') AS mla_constituencies,
+        (SELECT COUNT(*) FROM constituencies WHERE election_type = 'MP') AS mp_constituencies,
+        (SELECT COALESCE(SUM(votes), 0) FROM party_totals WHERE election_type = 'MLA') AS mla_votes,
+        (SELECT COALESCE(SUM(votes), 0) FROM party_totals WHERE election_type = 'MP') AS mp_votes,
+        q.total AS quantum_sessions,
+        q.secure AS secure_sessions,
+        q.eavesdropping AS eavesdropping_detected
+    FROM (
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN channel_secure THEN 1 ELSE 0 END), 0) AS secure,
+               COALESCE(SUM(CASE WHEN eavesdropping_detected THEN 1 ELSE 0 END), 0) AS eavesdropping
+        FROM quantum_channel_logs
+    ) AS q
+""")
+
+
+@results_cache(ttl=2, maxsize=1)
+async def get_dashboard_counts(db: AsyncSession) -> dict:
+    """Get all admin dashboard counts in one round trip"""
+    return dict((await db.execute(DASHBOARD_COUNTS_SQL)).mappings().one())
+
+
+# Channel health counters in one scan instead of three COUNT queries
+CHANNEL_HEALTH_COUNTS_SQL = text("""
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(CASE WHEN channel_secure THEN 1 ELSE 0 END), 0) AS secure,
+           COALESCE(SUM(CASE WHEN eavesdropping_detected THEN 1 ELSE 0 END), 0) AS eavesdropping
+    FROM quantum_channel_logs
+""")
+
+RECENT_CHANNEL_LOGS = select(
+    QuantumChannelLog.timestamp,
+    QuantumChannelLog.error_rate,
+    QuantumChannelLog.channel_secure,
+    QuantumChannelLog.eavesdropping_detected
+).order_by(QuantumChannelLog.timestamp.desc()).limit(10)
+
+
+@results_cache(ttl=2, maxsize=1)
+async def get_channel_health_counts(db: AsyncSession):
+    """Get (total, secure, eavesdropping) quantum channel counts"""
+    return (await db.execute(CHANNEL_HEALTH_COUNTS_SQL)).one()
+
+
+@results_cache(ttl=2, maxsize=1)
+async def get_recent_channel_logs(db: AsyncSession):
+    """Get the last 10 quantum channel statuses, newest first"""
+    return (await db.execute(RECENT_CHANNEL_LOGS)).all()
+
+
+# Per-district party totals ranked in SQL; rn = 1 is the leading party
+DISTRICT_VOTE_SUMMARY_SQL = text("""
+    WITH per_party AS (
+        SELECT c.district AS district,
+               cand.party_short AS party,
+               MAX(cand.party_color) AS color,
+               COUNT(v.id) AS votes
+        FROM votes v
+        JOIN candidates cand ON v.candidate_id = cand.id
+        JOIN constituencies c ON v.constituency_id = c.id
+        GROUP BY c.district, cand.party_short
+    )
+    SELECT district, party, color, votes,
+           SUM(votes) OVER (PARTITION BY district) AS total,
+           ROW_NUMBER() OVER (PARTITION BY district ORDER BY votes DESC) AS rn
+    FROM per_party
+    ORDER BY district, rn
+""")
+
+
+@results_cache()
+async def get_district_vote_summary(db: AsyncSession) -> List[dict]:
     """Get vote summary by district for map visualization"""
-    db = SessionLocal()
-    try:
-        from sqlalchemy import func
-        
-        # Get votes per district
-        results = db.query(
-            Constituency.district,
-            Candidate.party_short,
-            Candidate.party_color,
-            func.count(Vote.id).label('votes')
-        ).join(Candidate, Vote.candidate_id == Candidate.id).join(
-            Constituency, Vote.constituency_id == Constituency.id
-        ).group_by(
-            Constituency.district, Candidate.party_short, Candidate.party_color
-        ).all()
-        
-        # Process to find leading party per district
-        district_data = {}
-        for r in results:
-            district = r[0]
-            if district not in district_data:
-                district_data[district] = {"total": 0, "parties": {}}
-            district_data[district]["total"] += r[3]
-            if r[1] not in district_data[district]["parties"]:
-                district_data[district]["parties"][r[1]] = {"votes": 0, "color": r[2]}
-            district_data[district]["parties"][r[1]]["votes"] += r[3]
-        
-        # Find leading party
-        result_list = []
-        for district, data in district_data.items():
-            leading = max(data["parties"].items(), key=lambda x: x[1]["votes"]) if data["parties"] else None
+    rows = (await db.execute(DISTRICT_VOTE_SUMMARY_SQL)).all()
+    
+    # Rows arrive leader-first per district, so a single pass is enough
+    result_list = []
+    for district, party, color, votes, total, rn in rows:
+        if rn == 1:
+            breakdown = {}
             result_list.append({
                 "district": district,
-                "total_votes": data["total"],
-                "leading_party": leading[0] if leading else None,
-                "leading_color": leading[1]["color"] if leading else "#9E9E9E",
-                "party_breakdown": data["parties"]
+                "total_votes": total,
+                "leading_party": party,
+                "leading_color": color,
+                "party_breakdown": breakdown
             })
-        
-        return result_list
-    finally:
-        db.close()
+        breakdown[party] = {"votes": votes, "color": color}
+    
+    return result_list
+
 
-def get_district_constituencies_results(district_name: str, election_type: str = 'MLA') -> List[dict]:
+@results_cache()
+async def get_district_constituencies_results(db: AsyncSession, district_name: str, election_type: str = 'MLA') -> List[dict]:
     """Get constituency-level results for a specific district"""
-    db = SessionLocal()
-    try:
-        constituencies = db.query(Constituency).filter(
+    # One grouped query for every constituency in the district
+    rows = (await db.execute(
+        select(
+            Constituency.id,
+            Constituency.name,
+            Candidate.id,
+            Candidate.name,
+            Candidate.party_short,
+            Candidate.party_color,
+            func.count(Vote.id)
+        ).select_from(Constituency).outerjoin(
+            Candidate, Candidate.constituency_id == Constituency.id
+        ).outerjoin(
+            Vote, Vote.candidate_id == Candidate.id
+        ).where(
             Constituency.district == district_name,
             Constituency.election_type == election_type
-        ).all()
-        
-        results = []
-        for const in constituencies:
-            const_results = get_vote_counts_by_constituency(const.id)
-            total_votes = sum(r['votes'] for r in const_results)
-            
-            # Find winner
-            winner = None
-            if const_results:
-                const_results.sort(key=lambda x: x['votes'], reverse=True)
-                if const_results[0]['votes'] > 0:
-                    winner = const_results[0]
-            
-            results.append({
-                "id": const.id,
-                "name": const.name,
-                "total_votes": total_votes,
-                "winner": winner,
-                "all_candidates": const_results
+        ).group_by(Constituency.id, Candidate.id).order_by(Constituency.id)
+    )).all()
+
+    # Bucket candidate rows by constituency in a single pass
+    by_const = {}
+    for const_id, const_name, cand_id, cand_name, party, color, votes in rows:
+        if const_id not in by_const:
+            by_const[const_id] = {"id": const_id, "name": const_name, "all_candidates": []}
+        if cand_id is not None:
+            by_const[const_id]["all_candidates"].append({
+                "candidate_id": cand_id,
+                "candidate_name": cand_name,
+                "party": party,
+                "party_color": color,
+                "votes": votes
             })
-            
-        return results
-    finally:
-        db.close()
+    
+    results = []
+    for const in by_const.values():
+        const_results = const["all_candidates"]
+        const_results.sort(key=lambda x: x['votes'], reverse=True)
+        
+        # Find winner
+        winner = None
+        if const_results and const_results[0]['votes'] > 0:
+            winner = const_results[0]
+        
+        results.append({
+            "id": const["id"],
+            "name": const["name"],
+            "total_votes": sum(r['votes'] for r in const_results),
+            "winner": winner,
+            "all_candidates": const_results
+        })
+        
+    return results
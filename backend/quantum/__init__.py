@@ -3,12 +3,13 @@ Quantum module initialization
 """
 
 from .qkd import BB84Protocol, QuantumKeyManager, quantum_key_manager
-from .encryption import VoteEncryption, AnonymityGuard, vote_encryption, anonymity_guard
+from .encryption import EncryptedVote, VoteEncryption, AnonymityGuard, vote_encryption, anonymity_guard
 
 __all__ = [
     "BB84Protocol",
     "QuantumKeyManager", 
     "quantum_key_manager",
+    "EncryptedVote",
     "VoteEncryption",
     "AnonymityGuard",
     "vote_encryption",
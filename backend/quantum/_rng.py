@@ -0,0 +1,59 @@
+"""
+Buffered CSPRNG for per-vote random tokens.
+
+Draws ChaCha20 keystream in 4 KiB blocks instead of issuing one
+getrandom() syscall per token. Each thread has its own stream, seeded
+from os.urandom, rekeyed every 1 MiB and after a fork.
+"""
+
+import os
+import threading
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
+
+_BUFFER_SIZE = 4096
+_REKEY_BYTES = 1 << 20
+_ZEROS = bytes(_BUFFER_SIZE)
+
+
+class _ChaChaStream(threading.local):
+    """Per-thread ChaCha20 keystream buffer"""
+
+    def __init__(self):
+        self.pid = None
+
+    def _rekey(self):
+        self.encryptor = Cipher(
+            algorithms.ChaCha20(os.urandom(32), os.urandom(16)), mode=None
+        ).encryptor()
+        self.buffer = b""
+        self.pos = 0
+        self.generated = 0
+        self.pid = os.getpid()
+
+    def read(self, n: int) -> bytes:
+        if self.pid != os.getpid() or self.generated >= _REKEY_BYTES:
+            self._rekey()
+
+        if self.pos + n > len(self.buffer):
+            # Drop consumed bytes and top up with fresh keystream
+            block = self.encryptor.update(_ZEROS if n <= _BUFFER_SIZE else bytes(n))
+            self.buffer = self.buffer[self.pos:] + block
+            self.pos = 0
+            self.generated += len(block)
+
+        out = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+
+_stream = _ChaChaStream()
+
+
+def rand_bytes(n: int) -> bytes:
+    """n cryptographically random bytes (drop-in for secrets.token_bytes)"""
+    return _stream.read(n)
+
+
+def rand_hex(n: int) -> str:
+    """Hex string of n random bytes (drop-in for secrets.token_hex)"""
+    return _stream.read(n).hex()
@@ -7,14 +7,16 @@ without compromising voter privacy.
 """
 
 import hashlib
-import secrets
+import heapq
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from dataclasses import dataclass, field
-import json
 
+from ._rng import rand_hex
+from .pqc import canonical_json
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class AttackSimulation:
     """Represents a simulated attack on the quantum channel"""
     attack_id: str
@@ -26,7 +28,7 @@ class AttackSimulation:
     details: Dict
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AuditEntry:
     """Blockchain-style audit entry"""
     block_id: str
@@ -34,7 +36,14 @@ class AuditEntry:
     timestamp: datetime
     action: str
     data_hash: str
-    merkle_root: str
+    # Hash input and hash, built once; entries are frozen so they can't go stale
+    canonical_bytes: bytes = field(init=False, repr=False, compare=False)
+    block_hash: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        data = f"{self.block_id}{self.previous_hash}{self.timestamp}{self.action}{self.data_hash}"
+        object.__setattr__(self, "canonical_bytes", data.encode())
+        object.__setattr__(self, "block_hash", hashlib.sha256(self.canonical_bytes).hexdigest())
 
 
 class QuantumAttackSimulator:
@@ -54,6 +63,22 @@ class QuantumAttackSimulator:
     
     def __init__(self):
         self.attack_history: List[AttackSimulation] = []
+        # Running totals, updated per attack so summaries don't rescan history
+        self._totals = {"total": 0, "detected": 0, "blocked": 0}
+        self._by_type: Dict[str, Dict[str, int]] = {}
+    
+    def _record(self, attack: AttackSimulation):
+        """Append an attack to history and update the running totals"""
+        self.attack_history.append(attack)
+        counts = self._by_type.get(attack.attack_type)
+        if counts is None:
+            counts = self._by_type[attack.attack_type] = {"total": 0, "detected": 0, "blocked": 0}
+        for c in (self._totals, counts):
+            c["total"] += 1
+            if attack.detected:
+                c["detected"] += 1
+            if not attack.success:
+                c["blocked"] += 1
     
     def simulate_eve_intercept(self, intercept_rate: float = 0.3) -> AttackSimulation:
         """
@@ -65,7 +90,7 @@ class QuantumAttackSimulator:
         detected = expected_error_rate > 0.11  # 11% threshold
         
         attack = AttackSimulation(
-            attack_id=secrets.token_hex(8),
+            attack_id=rand_hex(8),
             attack_type="eve_intercept",
             timestamp=datetime.utcnow(),
             success=not detected,
@@ -79,7 +104,7 @@ class QuantumAttackSimulator:
                 "explanation": "Eve measures qubits with random bases, disturbing 25% of intercepted qubits"
             }
         )
-        self.attack_history.append(attack)
+        self._record(attack)
         return attack
     
     def simulate_pns_attack(self, multi_photon_rate: float = 0.1) -> AttackSimulation:
@@ -91,7 +116,7 @@ class QuantumAttackSimulator:
         detected = True  # We implement decoy state detection
         
         attack = AttackSimulation(
-            attack_id=secrets.token_hex(8),
+            attack_id=rand_hex(8),
             attack_type="photon_number_split",
             timestamp=datetime.utcnow(),
             success=False,
@@ -103,7 +128,7 @@ class QuantumAttackSimulator:
                 "explanation": "Eve splits multi-photon pulses but decoy states reveal the attack"
             }
         )
-        self.attack_history.append(attack)
+        self._record(attack)
         return attack
     
     def simulate_replay_attack(self) -> AttackSimulation:
@@ -115,7 +140,7 @@ class QuantumAttackSimulator:
         detected = True
         
         attack = AttackSimulation(
-            attack_id=secrets.token_hex(8),
+            attack_id=rand_hex(8),
             attack_type="replay",
             timestamp=datetime.utcnow(),
             success=False,
@@ -126,25 +151,15 @@ class QuantumAttackSimulator:
                 "explanation": "Each vote has a unique quantum-derived hash that cannot be replicated"
             }
         )
-        self.attack_history.append(attack)
+        self._record(attack)
         return attack
     
     def get_attack_summary(self) -> Dict:
         """Get summary of all simulated attacks"""
-        total = len(self.attack_history)
-        detected = sum(1 for a in self.attack_history if a.detected)
-        blocked = sum(1 for a in self.attack_history if not a.success)
-        
-        by_type = {}
-        for attack in self.attack_history:
-            t = attack.attack_type
-            if t not in by_type:
-                by_type[t] = {"total": 0, "detected": 0, "blocked": 0}
-            by_type[t]["total"] += 1
-            if attack.detected:
-                by_type[t]["detected"] += 1
-            if not attack.success:
-                by_type[t]["blocked"] += 1
+        total = self._totals["total"]
+        detected = self._totals["detected"]
+        blocked = self._totals["blocked"]
+        by_type = {t: dict(counts) for t, counts in self._by_type.items()}
         
         return {
             "total_attacks": total,
@@ -163,67 +178,131 @@ class BlockchainAuditTrail:
     All actions are logged with cryptographic linking.
     """
     
+    MERKLE_BATCH_SIZE = 1024
+    
     def __init__(self):
         self.chain: List[AuditEntry] = []
         self.pending_actions: List[Dict] = []
+        # Merkle tree over block data hashes, kept level by level (leaves first).
+        # New leaves wait in _pending_leaves and are folded in a batch at a
+        # time, so appends do no tree hashing until a root or proof is needed
+        self.merkle_layers: List[List[bytes]] = [[]]
+        self._pending_leaves: List[bytes] = []
+        self._block_index: Dict[str, int] = {}
         self._create_genesis_block()
     
     def _create_genesis_block(self):
         """Create the first block in the chain"""
+        genesis_digest = hashlib.sha256(b"genesis").digest()
         genesis = AuditEntry(
             block_id="GENESIS",
             previous_hash="0" * 64,
             timestamp=datetime.utcnow(),
             action="SYSTEM_INIT",
-            data_hash=hashlib.sha256(b"genesis").hexdigest(),
-            merkle_root=hashlib.sha256(b"genesis").hexdigest()
+            data_hash=genesis_digest.hex()
         )
+        self._append_merkle_leaf(genesis_digest)
+        self._block_index[genesis.block_id] = len(self.chain)
         self.chain.append(genesis)
     
-    def _compute_hash(self, entry: AuditEntry) -> str:
-        """Compute SHA-256 hash of an entry"""
-        data = f"{entry.block_id}{entry.previous_hash}{entry.timestamp}{entry.action}{entry.data_hash}"
-        return hashlib.sha256(data.encode()).hexdigest()
-    
     def add_action(self, action: str, data: Dict) -> AuditEntry:
         """Add a new action to the audit trail"""
-        previous_entry = self.chain[-1]
-        previous_hash = self._compute_hash(previous_entry)
+        previous_hash = self.chain[-1].block_hash
         
         # Hash the action data (without any PII)
-        data_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        data_digest = hashlib.sha256(canonical_json(data)).digest()
         
         entry = AuditEntry(
-            block_id=secrets.token_hex(8),
+            block_id=rand_hex(8),
             previous_hash=previous_hash,
             timestamp=datetime.utcnow(),
             action=action,
-            data_hash=data_hash,
-            merkle_root=self._compute_merkle_root([data_hash, previous_hash])
+            data_hash=data_digest.hex()
         )
+        self._append_merkle_leaf(data_digest)
+        self._block_index[entry.block_id] = len(self.chain)
         self.chain.append(entry)
         return entry
     
-    def _compute_merkle_root(self, hashes: List[str]) -> str:
-        """Compute Merkle root from list of hashes"""
-        if len(hashes) == 1:
-            return hashes[0]
+    def _append_merkle_leaf(self, leaf: bytes):
+        """Queue a leaf for the Merkle tree"""
+        self._pending_leaves.append(leaf)
+        if len(self._pending_leaves) >= self.MERKLE_BATCH_SIZE:
+            self.flush_merkle()
+    
+    def flush_merkle(self):
+        """Fold pending leaves into the Merkle tree, one level at a time"""
+        if not self._pending_leaves:
+            return
+        
+        layers = self.merkle_layers
+        first_changed = len(layers[0])
+        layers[0].extend(self._pending_leaves)
+        self._pending_leaves.clear()
         
-        combined = "".join(hashes)
-        return hashlib.sha256(combined.encode()).hexdigest()
+        # Only the right edge from the first new leaf upwards is rebuilt;
+        # an unpaired node is carried up to the next level unchanged
+        sha256 = hashlib.sha256
+        level = 0
+        while len(layers[level]) > 1:
+            layer = layers[level]
+            if level + 1 == len(layers):
+                layers.append([])
+            parent_layer = layers[level + 1]
+            first_changed //= 2
+            del parent_layer[first_changed:]
+            for i in range(2 * first_changed, len(layer), 2):
+                if i + 1 < len(layer):
+                    parent_layer.append(sha256(layer[i] + layer[i + 1]).digest())
+                else:
+                    parent_layer.append(layer[i])
+            level += 1
+    
+    def merkle_root(self) -> str:
+        """Current Merkle root over every block's data hash"""
+        self.flush_merkle()
+        return self.merkle_layers[-1][0].hex()
+    
+    def merkle_proof(self, block_id: str) -> Optional[Dict]:
+        """Get the sibling path proving a block's inclusion in the current root"""
+        index = self._block_index.get(block_id)
+        if index is None:
+            return None
+        
+        self.flush_merkle()
+        leaf = self.merkle_layers[0][index]
+        proof = []
+        for layer in self.merkle_layers:
+            if len(layer) == 1:
+                break
+            sibling = index ^ 1
+            if sibling < len(layer):
+                proof.append({
+                    "position": "left" if sibling < index else "right",
+                    "hash": layer[sibling].hex()
+                })
+            index //= 2
+        
+        return {
+            "block_id": block_id,
+            "leaf": leaf.hex(),
+            "merkle_root": self.merkle_layers[-1][0].hex(),
+            "proof": proof
+        }
     
     def verify_chain(self) -> Dict:
         """Verify the integrity of the entire audit chain"""
         if len(self.chain) < 2:
             return {"valid": True, "blocks_verified": len(self.chain)}
         
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i - 1]
-            
-            # Verify previous hash link
-            expected_hash = self._compute_hash(previous)
-            if current.previous_hash != expected_hash:
+        # Each block's hash was computed when it was created, so checking
+        # a link is a string compare; a replaced block carries its own new hash.
+        # add_action stores the predecessor's block_hash object itself as
+        # previous_hash, so an intact link compares by identity without
+        # touching the characters.
+        chain = self.chain
+        for previous, current in zip(chain, chain[1:]):
+            if current.previous_hash != previous.block_hash:
                 return {
                     "valid": False,
                     "error_block": current.block_id,
@@ -243,7 +322,7 @@ class BlockchainAuditTrail:
         return [
             {
                 "block_id": e.block_id,
-                "timestamp": e.timestamp.isoformat(),
+                "timestamp": e.timestamp,
                 "action": e.action,
                 "data_hash": e.data_hash[:16] + "...",
                 "verified": True
@@ -259,22 +338,43 @@ class VotingAnalytics:
     """
     
     def __init__(self):
-        self.hourly_votes: Dict[str, int] = {}
+        # Keyed by absolute hour number (ordinal day * 24 + hour); labels
+        # are only formatted when the trend is read
+        self.hourly_votes: Dict[int, int] = {}
+        self._latest_hour: Optional[int] = None
         self.district_participation: Dict[str, int] = {}
     
+    def reset(self):
+        """Forget all recorded votes (after the database is reset)"""
+        self.__init__()
+    
     def record_vote(self, district: str, timestamp: datetime = None):
         """Record a vote for analytics (aggregate only)"""
         if timestamp is None:
             timestamp = datetime.utcnow()
         
-        hour_key = timestamp.strftime("%Y-%m-%d %H:00")
+        hour_key = timestamp.toordinal() * 24 + timestamp.hour
         self.hourly_votes[hour_key] = self.hourly_votes.get(hour_key, 0) + 1
+        if self._latest_hour is None or hour_key > self._latest_hour:
+            self._latest_hour = hour_key
         self.district_participation[district] = self.district_participation.get(district, 0) + 1
     
+    def load_hourly_counts(self, counts: Dict[str, int]):
+        """Replace the hourly trend with per-hour totals ("YYYY-MM-DD HH") from the database"""
+        hourly_votes = {}
+        for hour, count in counts.items():
+            ts = datetime.strptime(hour, "%Y-%m-%d %H")
+            hourly_votes[ts.toordinal() * 24 + ts.hour] = count
+        self.hourly_votes = hourly_votes
+        self._latest_hour = max(hourly_votes, default=None)
+    
     def get_hourly_trend(self) -> List[Dict]:
         """Get hourly voting trend"""
         return [
-            {"hour": hour, "votes": count}
+            {
+                "hour": datetime.fromordinal(hour // 24).replace(hour=hour % 24).strftime("%Y-%m-%d %H:00"),
+                "votes": count
+            }
             for hour, count in sorted(self.hourly_votes.items())
         ]
     
@@ -284,25 +384,56 @@ class VotingAnalytics:
         return {
             "data": self.district_participation,
             "total": total,
-            "top_districts": sorted(
-                self.district_participation.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:10]
+            "top_districts": heapq.nlargest(
+                10, self.district_participation.items(), key=lambda x: x[1]
+            )
         }
     
+    def recent_hourly_rate(self, window: int = 3, now: datetime = None) -> Optional[float]:
+        """
+        Recency-weighted votes per hour over the last `window` hours up to now.
+        Weights rise linearly from 0.5 (oldest) to 1.0 (current); hours with
+        no votes count as zero. The current hour is still in progress, so it
+        only weighs in for the fraction that has elapsed: its votes are spread
+        over the time observed rather than a full hour.
+        Cost depends on the window, not on history.
+        """
+        if self._latest_hour is None:
+            return None
+        if now is None:
+            now = datetime.utcnow()
+        
+        current_hour = now.toordinal() * 24 + now.hour
+        elapsed = (now.minute * 60 + now.second) / 3600
+        if self._latest_hour > current_hour:
+            # Votes stamped ahead of this clock; treat their hour as complete
+            current_hour, elapsed = self._latest_hour, 1.0
+        
+        first_hour = current_hour - window + 1
+        weighted = 0.0
+        total_weight = 0.0
+        for i in range(window):
+            weight = 0.5 + 0.5 * i / max(window - 1, 1)
+            weighted += self.hourly_votes.get(first_hour + i, 0) * weight
+            total_weight += weight * (elapsed if i == window - 1 else 1.0)
+        return weighted / total_weight if total_weight else None
+    
     def predict_turnout(self, current_votes: int, elapsed_hours: float, total_hours: float = 12) -> Dict:
         """Predict final turnout based on current trend"""
         if elapsed_hours <= 0:
             return {"predicted_turnout": current_votes, "confidence": 0}
         
         hourly_rate = current_votes / elapsed_hours
+        # Project from the recent trend when hourly data exists
+        recent_rate = self.recent_hourly_rate()
+        projection_rate = hourly_rate if recent_rate is None else recent_rate
         remaining_hours = total_hours - elapsed_hours
-        predicted_additional = int(hourly_rate * remaining_hours * 0.8)  # Decay factor
+        predicted_additional = int(projection_rate * remaining_hours * 0.8)  # Decay factor
         
         return {
             "current_votes": current_votes,
             "hourly_rate": round(hourly_rate, 2),
+            "recent_hourly_rate": round(projection_rate, 2),
             "predicted_final": current_votes + predicted_additional,
             "remaining_hours": round(remaining_hours, 2),
             "confidence": min(90, int(elapsed_hours / total_hours * 100))
@@ -7,12 +7,56 @@ from the QKD module. It implements AES-256-GCM for symmetric encryption.
 """
 
 import hashlib
-import secrets
-import base64
+from binascii import b2a_base64
+from dataclasses import dataclass
 from typing import Dict, Tuple
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.backends import default_backend
 
+from ._rng import rand_bytes, rand_hex
+
+
+def _hkdf_sha256(key_material: bytes, salt: bytes) -> bytes:
+    """Single-block HKDF-SHA256 producing a 256-bit AES key"""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"quantum-voting-aes-256-gcm"
+    ).derive(key_material)
+
+
+def _b64(data: bytes) -> str:
+    """Base64 text without the base64-module wrapper or a trailing newline"""
+    return b2a_base64(data, newline=False).decode('ascii')
+
+
+@dataclass(frozen=True, slots=True)
+class EncryptedVote:
+    """AES-GCM output kept as raw bytes; base64 only when serialized"""
+    ciphertext: bytes
+    nonce: bytes
+    salt: bytes
+    tag: bytes
+    vote_hash: str
+    
+    @property
+    def encrypted_vote(self) -> str:
+        """Base64 ciphertext, the only field the votes table stores"""
+        return _b64(self.ciphertext)
+    
+    def to_dict(self) -> Dict:
+        """Base64-encoded form for JSON"""
+        return {
+            "encrypted_vote": _b64(self.ciphertext),
+            "nonce": _b64(self.nonce),
+            "salt": _b64(self.salt),
+            "tag": _b64(self.tag),
+            "vote_hash": self.vote_hash
+        }
+
 
 class VoteEncryption:
     """
@@ -23,20 +67,16 @@ class VoteEncryption:
     def __init__(self):
         self.backend = default_backend()
     
-    def derive_key(self, quantum_key: str, salt: bytes = None) -> bytes:
+    def derive_key(self, quantum_key: str, salt: bytes = None) -> Tuple[bytes, bytes]:
         """
-        Derive a 256-bit AES key from the quantum key using PBKDF2-like derivation.
+        Derive a 256-bit AES key from the quantum key using HKDF-SHA256.
         """
         if salt is None:
-            salt = secrets.token_bytes(16)
-        
-        # Use SHA-256 for key derivation
-        key_material = quantum_key.encode() + salt
-        derived_key = hashlib.sha256(key_material).digest()
+            salt = rand_bytes(16)
         
-        return derived_key, salt
+        return _hkdf_sha256(quantum_key.encode(), salt), salt
     
-    def encrypt_vote(self, vote_data: Dict, quantum_key: str) -> Dict:
+    def encrypt_vote(self, vote_data: Dict, quantum_key: str) -> EncryptedVote:
         """
         Encrypt vote data using the quantum-derived key.
         
@@ -45,17 +85,31 @@ class VoteEncryption:
             quantum_key: The quantum key from QKD protocol
             
         Returns:
-            Dictionary with encrypted vote, nonce, salt, and tag
+            EncryptedVote with raw ciphertext, nonce, salt, tag and vote hash
+        """
+        # Derive encryption key
+        encryption_key, salt = self.derive_key(quantum_key)
+        
+        return self._encrypt(vote_data, encryption_key, salt)
+    
+    @staticmethod
+    def tag_vote_hash(tag: bytes, nonce: bytes) -> str:
+        """
+        Public uniqueness token for an encrypted vote.
+        The GCM tag already authenticates key, nonce and ciphertext, so
+        hashing it with the nonce gives a unique hash without a second
+        pass over the vote itself.
         """
+        return hashlib.sha256(tag + nonce).hexdigest()
+    
+    def _encrypt(self, vote_data: Dict, encryption_key: bytes, salt: bytes) -> EncryptedVote:
+        """AES-GCM encrypt one vote with an already derived key"""
         # Serialize vote data
         vote_string = f"{vote_data['constituency_id']}:{vote_data['candidate_id']}:{vote_data['timestamp']}"
         vote_bytes = vote_string.encode('utf-8')
         
-        # Derive encryption key
-        encryption_key, salt = self.derive_key(quantum_key)
-        
         # Generate random nonce for GCM mode
-        nonce = secrets.token_bytes(12)
+        nonce = rand_bytes(12)
         
         # Create AES-GCM cipher
         cipher = Cipher(
@@ -68,41 +122,33 @@ class VoteEncryption:
         # Encrypt the vote
         ciphertext = encryptor.update(vote_bytes) + encryptor.finalize()
         
-        # Generate vote hash for uniqueness (no-cloning enforcement)
-        vote_hash = self.generate_vote_hash(vote_data, quantum_key)
-        
-        return {
-            "encrypted_vote": base64.b64encode(ciphertext).decode('utf-8'),
-            "nonce": base64.b64encode(nonce).decode('utf-8'),
-            "salt": base64.b64encode(salt).decode('utf-8'),
-            "tag": base64.b64encode(encryptor.tag).decode('utf-8'),
-            "vote_hash": vote_hash
-        }
+        # Vote hash for uniqueness (no-cloning enforcement)
+        return EncryptedVote(
+            ciphertext=ciphertext,
+            nonce=nonce,
+            salt=salt,
+            tag=encryptor.tag,
+            vote_hash=self.tag_vote_hash(encryptor.tag, nonce)
+        )
     
-    def decrypt_vote(self, encrypted_data: Dict, quantum_key: str) -> Dict:
+    def decrypt_vote(self, encrypted: EncryptedVote, quantum_key: str) -> Dict:
         """
         Decrypt vote data using the quantum-derived key.
         Only used for verification/audit purposes.
         """
-        # Decode components
-        ciphertext = base64.b64decode(encrypted_data['encrypted_vote'])
-        nonce = base64.b64decode(encrypted_data['nonce'])
-        salt = base64.b64decode(encrypted_data['salt'])
-        tag = base64.b64decode(encrypted_data['tag'])
-        
         # Derive the same key
-        encryption_key, _ = self.derive_key(quantum_key, salt)
+        encryption_key, _ = self.derive_key(quantum_key, encrypted.salt)
         
         # Create AES-GCM cipher for decryption
         cipher = Cipher(
             algorithms.AES(encryption_key),
-            modes.GCM(nonce, tag),
+            modes.GCM(encrypted.nonce, encrypted.tag),
             backend=self.backend
         )
         decryptor = cipher.decryptor()
         
         # Decrypt
-        decrypted_bytes = decryptor.update(ciphertext) + decryptor.finalize()
+        decrypted_bytes = decryptor.update(encrypted.ciphertext) + decryptor.finalize()
         vote_string = decrypted_bytes.decode('utf-8')
         
         # Parse vote data
@@ -113,41 +159,24 @@ class VoteEncryption:
             "timestamp": parts[2]
         }
     
-    def generate_vote_hash(self, vote_data: Dict, quantum_key: str) -> str:
-        """
-        Generate a unique hash for the vote (no-cloning theorem simulation).
-        This hash ensures each vote is unique and cannot be duplicated.
-        """
-        # Combine vote data with quantum key and random salt
-        unique_salt = secrets.token_hex(16)
-        hash_input = f"{vote_data['constituency_id']}:{vote_data['candidate_id']}:{quantum_key}:{unique_salt}"
-        
-        # Generate SHA-256 hash
-        vote_hash = hashlib.sha256(hash_input.encode()).hexdigest()
-        
-        return vote_hash
-    
-    def verify_vote_integrity(self, encrypted_vote: str, tag: str, 
-                              nonce: str, salt: str, quantum_key: str) -> bool:
+    def verify_vote_integrity(self, encrypted: EncryptedVote, quantum_key: str) -> bool:
         """
         Verify that a vote has not been tampered with.
         Uses GCM authentication tag for integrity verification.
         """
+        if encrypted.vote_hash != self.tag_vote_hash(encrypted.tag, encrypted.nonce):
+            return False
+        
         try:
-            ciphertext = base64.b64decode(encrypted_vote)
-            nonce_bytes = base64.b64decode(nonce)
-            salt_bytes = base64.b64decode(salt)
-            tag_bytes = base64.b64decode(tag)
-            
-            encryption_key, _ = self.derive_key(quantum_key, salt_bytes)
+            encryption_key, _ = self.derive_key(quantum_key, encrypted.salt)
             
             cipher = Cipher(
                 algorithms.AES(encryption_key),
-                modes.GCM(nonce_bytes, tag_bytes),
+                modes.GCM(encrypted.nonce, encrypted.tag),
                 backend=self.backend
             )
             decryptor = cipher.decryptor()
-            decryptor.update(ciphertext) + decryptor.finalize()
+            decryptor.update(encrypted.ciphertext) + decryptor.finalize()
             
             return True
         except Exception:
@@ -169,7 +198,7 @@ class AnonymityGuard:
         This allows verification without revealing the vote content.
         """
         # Create commitment using hash
-        commitment_input = f"{vote_data['candidate_id']}:{secrets.token_hex(32)}"
+        commitment_input = f"{vote_data['candidate_id']}:{rand_hex(32)}"
         commitment = hashlib.sha256(commitment_input.encode()).hexdigest()
         
         # Store commitment (session is destroyed after voting)
@@ -183,7 +212,7 @@ class AnonymityGuard:
         without revealing any identifying information.
         """
         # Create a short, user-friendly receipt code
-        receipt_data = f"{vote_hash}:{secrets.token_hex(8)}"
+        receipt_data = f"{vote_hash}:{rand_hex(8)}"
         receipt_hash = hashlib.sha256(receipt_data.encode()).hexdigest()
         
         # Format as readable receipt code (e.g., QV-XXXX-XXXX-XXXX)
@@ -6,10 +6,18 @@ Simulates CRYSTALS-Dilithium signatures for quantum-safe vote authentication.
 """
 
 import hashlib
+import os
 import secrets
-import json
 import base64
 
+import orjson
+
+
+def canonical_json(data: dict) -> bytes:
+    """Serialize data with sorted keys for hashing and signing"""
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+
 class PQCSigner:
     """
     Simulated CRYSTALS-Dilithium Signer.
@@ -21,6 +29,8 @@ class PQCSigner:
         self.private_key = secrets.token_bytes(64)
         self.public_key = secrets.token_bytes(32)
         self.algorithm = "Dilithium2"
+        # Keyed BLAKE2b by default; set PQC_SIGNATURE_HASH=sha3_512 for the original digest
+        self.signature_hash = os.environ.get("PQC_SIGNATURE_HASH", "blake2b")
         
     def generate_keys(self):
         """Generates a new PQC key pair"""
@@ -29,19 +39,25 @@ class PQCSigner:
             "algorithm": self.algorithm
         }
 
+    def _digest(self, message: bytes) -> bytes:
+        """64-byte digest of private key + message"""
+        if self.signature_hash == "sha3_512":
+            h = hashlib.sha3_512()
+            h.update(self.private_key)
+            h.update(message)
+            return h.digest()
+        return hashlib.blake2b(message, key=self.private_key).digest()
+
     def sign_vote(self, vote_data: dict):
         """
         Signs vote data using simulated Dilithium signature.
         """
         # 1. Canonicalize data
-        message = json.dumps(vote_data, sort_keys=True).encode('utf-8')
+        message = canonical_json(vote_data)
         
         # 2. Simulate Dilithium signature logic
         # In reality, this involves polynomial mathematics resistant to Shor's algorithm
-        h = hashlib.sha3_512()
-        h.update(self.private_key)
-        h.update(message)
-        signature_bytes = h.digest()
+        signature_bytes = self._digest(message)
         
         return base64.b64encode(signature_bytes).decode('utf-8')
 
@@ -51,18 +67,15 @@ class PQCSigner:
         """
         try:
             # 1. Decode inputs
-            message = json.dumps(vote_data, sort_keys=True).encode('utf-8')
+            message = canonical_json(vote_data)
             signature_bytes = base64.b64decode(signature)
             pub_key = base64.b64decode(public_key_b64)
             
             # 2. Simulation check
-            # For the demo, we check if the signature matches the SHA3-512 
+            # For the demo, we check if the signature matches the digest
             # of the private key + message (conceptually mirroring the signing)
             # In a real Dilithium check, the public key would verify the proof
-            h = hashlib.sha3_512()
-            h.update(self.private_key) # Using the internal "private key" for simulation verification
-            h.update(message)
-            expected_sig = h.digest()
+            expected_sig = self._digest(message)  # Using the internal "private key" for simulation verification
             
             return secrets.compare_digest(signature_bytes, expected_sig)
         except Exception:
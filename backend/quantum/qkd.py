@@ -8,40 +8,56 @@ for secure key exchange between voter and server.
 Note: This is an educational simulation, not actual quantum computing.
 """
 
+import os
+import threading
+import time
 import secrets
 import hashlib
-import random
-from typing import Tuple, List, Dict
-from dataclasses import dataclass
-from enum import Enum
+from collections import OrderedDict
+from typing import Tuple, Dict
+from enum import IntEnum
 
+import numpy as np
 
-class Basis(Enum):
-    """Measurement basis for quantum bits"""
-    RECTILINEAR = "+"  # |0⟩, |1⟩
-    DIAGONAL = "×"     # |+⟩, |-⟩
 
+class Basis(IntEnum):
+    """Measurement basis for quantum bits (values match the uint8 basis codes)"""
+    RECTILINEAR = 0  # |0⟩, |1⟩
+    DIAGONAL = 1     # |+⟩, |-⟩
 
-class QubitState(Enum):
-    """Possible qubit states"""
-    ZERO = "|0⟩"
-    ONE = "|1⟩"
-    PLUS = "|+⟩"
-    MINUS = "|-⟩"
 
+# Shared generator for the bases and simulated channel noise, seeded from the
+# OS CSPRNG. Key bits never come from it: PCG64 is not a cryptographic RNG.
+_RNG: np.random.Generator = None
+_RNG_PID = None
 
-@dataclass
-class QuantumBit:
-    """Represents a quantum bit with state and basis"""
-    value: int  # 0 or 1
-    basis: Basis
-    
-    @property
-    def state(self) -> QubitState:
-        if self.basis == Basis.RECTILINEAR:
-            return QubitState.ZERO if self.value == 0 else QubitState.ONE
-        else:
-            return QubitState.PLUS if self.value == 0 else QubitState.MINUS
+
+def _reseed():
+    """Replace the shared generator with a freshly seeded one"""
+    global _RNG, _RNG_PID
+    _RNG = np.random.default_rng(int.from_bytes(secrets.token_bytes(32), "big"))
+    _RNG_PID = os.getpid()
+
+
+def _rng() -> np.random.Generator:
+    # Forked workers must not continue the parent's stream
+    if _RNG_PID != os.getpid():
+        _reseed()
+    return _RNG
+
+
+_reseed()
+
+
+# Static part of the protocol_steps payload; descriptions are filled per run
+_STEP_TEMPLATES = (
+    {"step": 1, "name": "Quantum Bit Preparation"},
+    {"step": 2, "name": "Quantum Channel Transmission"},
+    {"step": 3, "name": "Quantum Measurement"},
+    {"step": 4, "name": "Basis Reconciliation"},
+    {"step": 5, "name": "Security Verification"},
+    {"step": 6, "name": "Key Finalization"},
+)
 
 
 class BB84Protocol:
@@ -56,52 +72,39 @@ class BB84Protocol:
         self.key_length = key_length
         self.raw_key_length = key_length * 2  # Optimized: reduced from 4x for faster processing
         self.eavesdropping_threshold = 0.11  # 11% error rate indicates eavesdropping
+        self._preparation_description = (
+            f"Generated {self.raw_key_length} quantum bits with random polarization"
+        )
         
-    def generate_random_bits(self, length: int) -> List[int]:
-        """Generate cryptographically secure random bits"""
-        return [secrets.randbelow(2) for _ in range(length)]
-    
-    def generate_random_bases(self, length: int) -> List[Basis]:
-        """Generate random measurement bases"""
-        return [random.choice([Basis.RECTILINEAR, Basis.DIAGONAL]) for _ in range(length)]
+    def generate_random_bits(self, length: int) -> np.ndarray:
+        """Generate cryptographically secure random bits (they become the session key)"""
+        return np.unpackbits(np.frombuffer(secrets.token_bytes((length + 7) // 8), np.uint8))[:length]
     
-    def prepare_qubits(self, bits: List[int], bases: List[Basis]) -> List[QuantumBit]:
-        """Alice prepares qubits in random states using random bases"""
-        return [QuantumBit(value=b, basis=basis) for b, basis in zip(bits, bases)]
+    def generate_random_bases(self, length: int) -> np.ndarray:
+        """Generate random measurement bases as uint8 Basis codes"""
+        return _rng().integers(0, 2, size=length, dtype=np.uint8)
     
-    def measure_qubits(self, qubits: List[QuantumBit], measurement_bases: List[Basis]) -> List[int]:
+    def prepare_qubits(self, bits: np.ndarray, bases: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Bob measures qubits using his randomly chosen bases.
-        If bases match, measurement is deterministic.
-        If bases don't match, measurement is random (50/50).
+        Alice prepares qubits in random states using random bases.
+        Qubits are kept as parallel (values, bases) uint8 arrays.
         """
-        results = []
-        for qubit, measure_basis in zip(qubits, measurement_bases):
-            if qubit.basis == measure_basis:
-                # Bases match - deterministic result
-                results.append(qubit.value)
-            else:
-                # Bases don't match - random result (quantum uncertainty)
-                results.append(secrets.randbelow(2))
-        return results
+        return bits.copy(), bases.copy()
     
-    def sift_keys(self, alice_bits: List[int], bob_bits: List[int],
-                  alice_bases: List[Basis], bob_bases: List[Basis]) -> Tuple[List[int], List[int]]:
+    def measure_and_sift(self, alice_bits: np.ndarray, q_vals: np.ndarray,
+                         q_bases: np.ndarray, bob_bases: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Sift keys by keeping only bits where Alice and Bob used the same basis.
-        This is done over a classical (but authenticated) channel.
+        Bob measures qubits using his randomly chosen bases, then both sides
+        keep only the bits where the bases match (sifting, done over a
+        classical but authenticated channel).
+        A mismatched basis gives a random (50/50) measurement, but sifting
+        discards exactly those positions, so Bob's sifted key is the (possibly
+        disturbed) qubit values under the basis mask and no random draw is needed.
         """
-        alice_sifted = []
-        bob_sifted = []
-        
-        for i in range(len(alice_bits)):
-            if alice_bases[i] == bob_bases[i]:
-                alice_sifted.append(alice_bits[i])
-                bob_sifted.append(bob_bits[i])
-        
-        return alice_sifted, bob_sifted
+        mask = q_bases == bob_bases
+        return alice_bits[mask], q_vals[mask]
     
-    def estimate_error_rate(self, alice_key: List[int], bob_key: List[int], 
+    def estimate_error_rate(self, alice_key: np.ndarray, bob_key: np.ndarray, 
                             sample_size: int = 25) -> float:
         """
         Estimate error rate by comparing a sample of bits.
@@ -113,36 +116,28 @@ class BB84Protocol:
         if sample_size == 0:
             return 0.0
             
-        # Select random positions to compare
-        positions = random.sample(range(len(alice_key)), sample_size)
-        errors = sum(1 for pos in positions if alice_key[pos] != bob_key[pos])
+        # Select random positions to compare; XOR marks disagreeing bits
+        positions = _rng().choice(len(alice_key), sample_size, replace=False)
+        errors = int(np.count_nonzero(alice_key[positions] ^ bob_key[positions]))
         
         return errors / sample_size
     
-    def simulate_eavesdropping(self, qubits: List[QuantumBit], 
-                               intercept_rate: float = 0.0) -> Tuple[List[QuantumBit], bool]:
+    def simulate_eavesdropping(self, q_vals: np.ndarray, q_bases: np.ndarray,
+                               intercept_rate: float = 0.0) -> bool:
         """
         Simulate an eavesdropper (Eve) intercepting qubits.
         Eve measures and re-sends, introducing detectable errors.
+        Disturbed values are overwritten in q_vals in place.
         """
-        was_intercepted = False
-        modified_qubits = []
-        
-        for qubit in qubits:
-            if random.random() < intercept_rate:
-                was_intercepted = True
-                # Eve measures with random basis
-                eve_basis = random.choice([Basis.RECTILINEAR, Basis.DIAGONAL])
-                if eve_basis != qubit.basis:
-                    # Eve's measurement disturbs the qubit
-                    new_value = secrets.randbelow(2)
-                    modified_qubits.append(QuantumBit(value=new_value, basis=qubit.basis))
-                else:
-                    modified_qubits.append(qubit)
-            else:
-                modified_qubits.append(qubit)
+        rng = _rng()
+        n = len(q_vals)
+        intercepted = rng.random(n) < intercept_rate
+        # Eve measures with random basis; a wrong basis disturbs the qubit
+        eve_bases = rng.integers(0, 2, size=n, dtype=np.uint8)
+        disturbed = intercepted & (eve_bases != q_bases)
+        q_vals[disturbed] = rng.integers(0, 2, size=int(np.count_nonzero(disturbed)), dtype=np.uint8)
         
-        return modified_qubits, was_intercepted
+        return bool(intercepted.any())
     
     def generate_shared_key(self, simulate_eve: bool = False, 
                             eve_intercept_rate: float = 0.3) -> Dict:
@@ -157,82 +152,60 @@ class BB84Protocol:
             - eavesdropping_detected: Whether eavesdropping was detected
             - protocol_steps: List of protocol steps for visualization
         """
-        protocol_steps = []
-        
         # Step 1: Alice generates random bits and bases
         alice_bits = self.generate_random_bits(self.raw_key_length)
         alice_bases = self.generate_random_bases(self.raw_key_length)
-        protocol_steps.append({
-            "step": 1,
-            "name": "Quantum Bit Preparation",
-            "description": f"Generated {self.raw_key_length} quantum bits with random polarization",
-            "status": "complete"
-        })
-        
-        # Step 2: Alice prepares qubits
-        qubits = self.prepare_qubits(alice_bits, alice_bases)
-        protocol_steps.append({
-            "step": 2,
-            "name": "Quantum Channel Transmission",
-            "description": "Transmitting qubits through quantum channel",
-            "status": "complete"
-        })
-        
-        # Step 3: Simulate eavesdropping if enabled
-        eve_intercepted = False
-        if simulate_eve:
-            qubits, eve_intercepted = self.simulate_eavesdropping(qubits, eve_intercept_rate)
         
-        # Step 4: Bob generates random measurement bases and measures
         bob_bases = self.generate_random_bases(self.raw_key_length)
-        bob_bits = self.measure_qubits(qubits, bob_bases)
-        protocol_steps.append({
-            "step": 3,
-            "name": "Quantum Measurement",
-            "description": "Measuring qubits with random bases",
-            "status": "complete"
-        })
+        eve_intercepted = False
         
-        # Step 5: Sift keys (keep only matching bases)
-        alice_sifted, bob_sifted = self.sift_keys(alice_bits, bob_bits, alice_bases, bob_bases)
-        protocol_steps.append({
-            "step": 4,
-            "name": "Basis Reconciliation",
-            "description": f"Sifted to {len(alice_sifted)} bits with matching bases",
-            "status": "complete"
-        })
+        if not simulate_eve or eve_intercept_rate <= 0:
+            # Nothing disturbs the channel, so Bob's sifted key is Alice's
+            # by construction and sampling it could only ever find 0 errors
+            alice_sifted = alice_bits[alice_bases == bob_bases]
+            error_rate = 0.0
+        else:
+            # Step 2: Alice prepares qubits
+            q_vals, q_bases = self.prepare_qubits(alice_bits, alice_bases)
+            
+            # Step 3: Simulate eavesdropping
+            eve_intercepted = self.simulate_eavesdropping(q_vals, q_bases, eve_intercept_rate)
+            
+            # Step 4: Bob measures with his random bases
+            # Step 5: Sift keys (keep only matching bases)
+            alice_sifted, bob_sifted = self.measure_and_sift(alice_bits, q_vals, q_bases, bob_bases)
+            
+            # Step 6: Error estimation
+            error_rate = self.estimate_error_rate(alice_sifted, bob_sifted)
         
-        # Step 6: Error estimation
-        error_rate = self.estimate_error_rate(alice_sifted, bob_sifted)
         eavesdropping_detected = error_rate > self.eavesdropping_threshold
         
-        protocol_steps.append({
-            "step": 5,
-            "name": "Security Verification",
-            "description": f"Error rate: {error_rate:.2%}" + 
-                          (" ⚠️ EAVESDROPPING DETECTED!" if eavesdropping_detected else " ✅ Channel secure"),
-            "status": "warning" if eavesdropping_detected else "complete"
-        })
-        
         # Step 7: Generate final key (use first key_length bits)
         final_key_bits = alice_sifted[:self.key_length]
         
-        # Convert bits to bytes then to hex string
+        # Pack whole bytes (MSB first) then hex; trailing partial byte is dropped
         if len(final_key_bits) >= 8:
-            key_bytes = bytes([
-                int(''.join(map(str, final_key_bits[i:i+8])), 2)
-                for i in range(0, len(final_key_bits) - len(final_key_bits) % 8, 8)
-            ])
-            shared_key = key_bytes.hex()
+            whole = len(final_key_bits) - len(final_key_bits) % 8
+            shared_key = np.packbits(final_key_bits[:whole]).tobytes().hex()
         else:
-            shared_key = hashlib.sha256(str(final_key_bits).encode()).hexdigest()
+            # Too short to pack; stretch the raw bit bytes instead
+            shared_key = hashlib.sha256(final_key_bits.tobytes()).hexdigest()
         
-        protocol_steps.append({
-            "step": 6,
-            "name": "Key Finalization",
-            "description": f"Generated {len(shared_key) * 4}-bit secure key",
-            "status": "complete"
-        })
+        # Only the description/status of the later steps depend on this run
+        dynamic = (
+            (self._preparation_description, "complete"),
+            ("Transmitting qubits through quantum channel", "complete"),
+            ("Measuring qubits with random bases", "complete"),
+            (f"Sifted to {len(alice_sifted)} bits with matching bases", "complete"),
+            (f"Error rate: {error_rate:.2%}" +
+             (" ⚠️ EAVESDROPPING DETECTED!" if eavesdropping_detected else " ✅ Channel secure"),
+             "warning" if eavesdropping_detected else "complete"),
+            (f"Generated {len(shared_key) * 4}-bit secure key", "complete"),
+        )
+        protocol_steps = [
+            {**template, "description": description, "status": status}
+            for template, (description, status) in zip(_STEP_TEMPLATES, dynamic)
+        ]
         
         return {
             "shared_key": shared_key,
@@ -251,9 +224,15 @@ class QuantumKeyManager:
     Each voter session gets a unique quantum-generated key.
     """
     
+    MAX_SESSIONS = 10000  # oldest keys are evicted past this
+    SESSION_TTL = 2 * 60 * 60  # seconds; matches the voter session expiry
+    
     def __init__(self):
-        self.active_keys: Dict[str, str] = {}
+        # session_id -> (raw key bytes, monotonic expiry), oldest key first
+        self.active_keys: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
         self.protocol = BB84Protocol(key_length=256)
+        # Key generation runs on threadpool workers; guards active_keys
+        self._lock = threading.Lock()
     
     def generate_session_key(self, session_id: str, simulate_attack: bool = False) -> Dict:
         """Generate a new quantum key for a voter session"""
@@ -263,20 +242,24 @@ class QuantumKeyManager:
         )
         
         if result["channel_secure"]:
-            self.active_keys[session_id] = result["shared_key"]
+            now = time.monotonic()
+            entry = (bytes.fromhex(result["shared_key"]), now + self.SESSION_TTL)
+            with self._lock:
+                self.active_keys[session_id] = entry
+                self.active_keys.move_to_end(session_id)
+                # Keys are ordered by expiry, so expired ones are all at the front
+                while self.active_keys:
+                    oldest = next(iter(self.active_keys.values()))
+                    if oldest[1] >= now and len(self.active_keys) <= self.MAX_SESSIONS:
+                        break
+                    self.active_keys.popitem(last=False)
         
         return result
     
-    def get_session_key(self, session_id: str) -> str | None:
-        """Retrieve the quantum key for a session"""
-        return self.active_keys.get(session_id)
-    
     def invalidate_session(self, session_id: str) -> bool:
         """Invalidate a session key after use"""
-        if session_id in self.active_keys:
-            del self.active_keys[session_id]
-            return True
-        return False
+        with self._lock:
+            return self.active_keys.pop(session_id, None) is not None
     
     def get_active_sessions_count(self) -> int:
         """Get count of active quantum sessions"""
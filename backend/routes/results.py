@@ -6,75 +6,85 @@ Handles result aggregation and admin dashboard data.
 Only aggregate results are shown - no individual voter data.
 """
 
+import csv
+import io
+from collections import defaultdict
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.database import (
-    SessionLocal, Constituency, Candidate, Vote, QuantumChannelLog,
-    get_vote_counts_by_constituency, get_party_wise_results
+    get_db, get_constituency, get_constituencies_by_type,
+    get_vote_counts_by_constituency, get_vote_counts_bulk, get_party_wise_results,
+    get_dashboard_counts, get_channel_health_counts, get_recent_channel_logs
 )
 
 router = APIRouter(prefix="/results", tags=["Results"])
 
 
 @router.get("/constituency/{constituency_id}")
-async def get_constituency_results(constituency_id: int):
+async def get_constituency_results(constituency_id: int, db: AsyncSession = Depends(get_db)):
     """
     Get vote results for a specific constituency.
     Shows candidate-wise vote counts only.
     """
-    db = SessionLocal()
-    try:
-        constituency = db.query(Constituency).filter(
-            Constituency.id == constituency_id
-        ).first()
-        
-        if not constituency:
-            raise HTTPException(status_code=404, detail="Constituency not found")
-        
-        results = get_vote_counts_by_constituency(constituency_id)
-        
-        # Calculate total and percentages
-        total_votes = sum(r['votes'] for r in results)
-        
-        for r in results:
-            r['percentage'] = round((r['votes'] / max(total_votes, 1)) * 100, 2)
-        
-        # Sort by votes descending
-        results.sort(key=lambda x: x['votes'], reverse=True)
-        
-        return {
-            "constituency": {
-                "id": constituency.id,
-                "name": constituency.name,
-                "district": constituency.district,
-                "election_type": constituency.election_type
-            },
-            "total_votes": total_votes,
-            "results": results,
-            "winner": results[0] if results and results[0]['votes'] > 0 else None
-        }
-    finally:
-        db.close()
+    constituency = await get_constituency(db, constituency_id)
+    
+    if not constituency:
+        raise HTTPException(status_code=404, detail="Constituency not found")
+    
+    results = await get_vote_counts_by_constituency(db, constituency_id)
+    
+    # Calculate total and percentages
+    total_votes = sum(r['votes'] for r in results)
+    
+    for r in results:
+        r['percentage'] = round((r['votes'] / max(total_votes, 1)) * 100, 2)
+    
+    # Sort by votes descending
+    results.sort(key=lambda x: x['votes'], reverse=True)
+    
+    return {
+        "constituency": {
+            "id": constituency["id"],
+            "name": constituency["name"],
+            "district": constituency["district"],
+            "election_type": constituency["election_type"]
+        },
+        "total_votes": total_votes,
+        "results": results,
+        "winner": results[0] if results and results[0]['votes'] > 0 else None
+    }
+
+
+def _check_election_type(election_type: str):
+    """Reject anything other than the two supported election types"""
+    if election_type not in ['MLA', 'MP']:
+        raise HTTPException(status_code=400, detail="Election type must be 'MLA' or 'MP'")
 
 
 @router.get("/party-wise/{election_type}")
-async def get_party_wise(election_type: str):
+async def get_party_wise(election_type: str, db: AsyncSession = Depends(get_db)):
     """
     Get party-wise aggregated results for an election type.
     
     Args:
         election_type: 'MLA' or 'MP'
     """
-    if election_type not in ['MLA', 'MP']:
-        raise HTTPException(status_code=400, detail="Election type must be 'MLA' or 'MP'")
-    
-    results = get_party_wise_results(election_type)
+    _check_election_type(election_type)
+    return await compute_party_wise(db, election_type)
+
+
+async def compute_party_wise(db: AsyncSession, election_type: str) -> dict:
+    """Party-wise vote totals and percentages for an election type"""
+    # Cached rows are shared, so percentages go on copies
+    results = await get_party_wise_results(db, election_type)
     total_votes = sum(r['votes'] for r in results)
-    
-    for r in results:
-        r['percentage'] = round((r['votes'] / max(total_votes, 1)) * 100, 2)
+    results = [
+        {**r, 'percentage': round((r['votes'] / max(total_votes, 1)) * 100, 2)}
+        for r in results
+    ]
     
     return {
         "election_type": election_type,
@@ -84,75 +94,75 @@ async def get_party_wise(election_type: str):
 
 
 @router.get("/all/{election_type}")
-async def get_all_results(election_type: str):
+async def get_all_results(election_type: str, db: AsyncSession = Depends(get_db)):
     """
     Get results for all constituencies of an election type.
     """
-    if election_type not in ['MLA', 'MP']:
-        raise HTTPException(status_code=400, detail="Election type must be 'MLA' or 'MP'")
+    _check_election_type(election_type)
+    return await compute_all_results(db, election_type)
+
+
+async def compute_all_results(db: AsyncSession, election_type: str) -> dict:
+    """Per-constituency winners and party seat totals for an election type"""
+    # Plain (id, name, district) rows from the reference cache, not ORM objects
+    constituencies = await get_constituencies_by_type(db, election_type)
     
-    db = SessionLocal()
-    try:
-        constituencies = db.query(Constituency).filter(
-            Constituency.election_type == election_type
-        ).all()
-        
-        all_results = []
-        party_totals = {}
-        
-        for const in constituencies:
-            results = get_vote_counts_by_constituency(const.id)
-            total_votes = sum(r['votes'] for r in results)
-            
-            # Find winner
-            winner = None
-            if results:
-                results.sort(key=lambda x: x['votes'], reverse=True)
-                if results[0]['votes'] > 0:
-                    winner = results[0]
-                    
-                    # Track party totals
-                    party = winner['party']
-                    if party not in party_totals:
-                        party_totals[party] = {'seats': 0, 'votes': 0}
-                    party_totals[party]['seats'] += 1
-                    party_totals[party]['votes'] += winner['votes']
-            
-            all_results.append({
-                "constituency_id": const.id,
-                "constituency_name": const.name,
-                "district": const.district,
-                "total_votes": total_votes,
-                "winner": winner
-            })
+    # One grouped query for every constituency instead of one per constituency
+    vote_counts = await get_vote_counts_bulk(db, election_type)
+    
+    all_results = []
+    party_totals = defaultdict(lambda: {'seats': 0, 'votes': 0})
+    
+    for const in constituencies:
+        results = vote_counts.get(const['id'], [])
+        total_votes = sum(r['votes'] for r in results)
         
-        # Convert party totals to list
-        party_summary = [
-            {"party": party, "seats": data['seats'], "votes": data['votes']}
-            for party, data in party_totals.items()
-        ]
-        party_summary.sort(key=lambda x: x['seats'], reverse=True)
+        # Find winner
+        winner = None
+        if results:
+            results.sort(key=lambda x: x['votes'], reverse=True)
+            if results[0]['votes'] > 0:
+                winner = results[0]
+                
+                # Track party totals
+                party = winner['party']
+                party_totals[party]['seats'] += 1
+                party_totals[party]['votes'] += winner['votes']
         
-        return {
-            "election_type": election_type,
-            "total_constituencies": len(constituencies),
-            "constituencies_with_votes": len([r for r in all_results if r['total_votes'] > 0]),
-            "constituency_results": all_results,
-            "party_summary": party_summary
-        }
-    finally:
-        db.close()
+        all_results.append({
+            "constituency_id": const['id'],
+            "constituency_name": const['name'],
+            "district": const['district'],
+            "total_votes": total_votes,
+            "winner": winner
+        })
+    
+    # Convert party totals to list
+    party_summary = [
+        {"party": party, "seats": data['seats'], "votes": data['votes']}
+        for party, data in party_totals.items()
+    ]
+    party_summary.sort(key=lambda x: x['seats'], reverse=True)
+    
+    return {
+        "election_type": election_type,
+        "total_constituencies": len(constituencies),
+        "constituencies_with_votes": len([r for r in all_results if r['total_votes'] > 0]),
+        "constituency_results": all_results,
+        "party_summary": party_summary
+    }
 
 
 @router.get("/district/{district_name}")
-async def get_district_results(district_name: str, election_type: str = 'MLA'):
+async def get_district_results(district_name: str, election_type: str = 'MLA',
+                               db: AsyncSession = Depends(get_db)):
     """
     Get constituency-level results for a specific district.
     Used for map drill-down.
     """
     from models.database import get_district_constituencies_results
     
-    results = get_district_constituencies_results(district_name, election_type)
+    results = await get_district_constituencies_results(db, district_name, election_type)
     
     return {
         "district": district_name,
@@ -163,64 +173,62 @@ async def get_district_results(district_name: str, election_type: str = 'MLA'):
 
 
 @router.get("/quantum/channel-health")
-async def get_quantum_channel_health():
+async def get_quantum_channel_health(db: AsyncSession = Depends(get_db)):
     """
     Get quantum channel health statistics.
     Shows aggregated security metrics.
     """
-    db = SessionLocal()
-    try:
-        total_sessions = db.query(QuantumChannelLog).count()
-        secure_sessions = db.query(QuantumChannelLog).filter(
-            QuantumChannelLog.channel_secure == True
-        ).count()
-        
-        eavesdropping_detected = db.query(QuantumChannelLog).filter(
-            QuantumChannelLog.eavesdropping_detected == True
-        ).count()
-        
-        # Get last 10 channel statuses
-        recent_logs = db.query(QuantumChannelLog).order_by(
-            QuantumChannelLog.timestamp.desc()
-        ).limit(10).all()
-        
-        recent_status = [
-            {
-                "timestamp": log.timestamp.isoformat(),
-                "error_rate": log.error_rate,
-                "secure": log.channel_secure,
-                "eavesdropping": log.eavesdropping_detected
-            }
-            for log in recent_logs
-        ]
-        
-        return {
-            "total_quantum_sessions": total_sessions,
-            "secure_sessions": secure_sessions,
-            "compromised_sessions": total_sessions - secure_sessions,
-            "eavesdropping_attempts": eavesdropping_detected,
-            "security_rate": round((secure_sessions / max(total_sessions, 1)) * 100, 2),
-            "channel_status": "SECURE" if total_sessions == 0 or secure_sessions == total_sessions else "ALERT",
-            "recent_activity": recent_status
+    return await compute_channel_health(db)
+
+
+async def compute_channel_health(db: AsyncSession) -> dict:
+    """Quantum channel security counts and the last 10 channel statuses"""
+    total_sessions, secure_sessions, eavesdropping_detected = await get_channel_health_counts(db)
+    recent_logs = await get_recent_channel_logs(db)
+    
+    recent_status = [
+        {
+            "timestamp": log.timestamp,
+            "error_rate": log.error_rate,
+            "secure": log.channel_secure,
+            "eavesdropping": log.eavesdropping_detected
         }
-    finally:
-        db.close()
+        for log in recent_logs
+    ]
+    
+    return {
+        "total_quantum_sessions": total_sessions,
+        "secure_sessions": secure_sessions,
+        "compromised_sessions": total_sessions - secure_sessions,
+        "eavesdropping_attempts": eavesdropping_detected,
+        "security_rate": round((secure_sessions / max(total_sessions, 1)) * 100, 2),
+        "channel_status": "SECURE" if total_sessions == 0 or secure_sessions == total_sessions else "ALERT",
+        "recent_activity": recent_status
+    }
 
 
 @router.get("/export/{election_type}")
-async def export_results(election_type: str, format: str = "json"):
+async def export_results(election_type: str, format: str = "json", db: AsyncSession = Depends(get_db)):
     """
     Export results for download.
     Only aggregate data - no voter information.
     """
-    if election_type not in ['MLA', 'MP']:
-        raise HTTPException(status_code=400, detail="Election type must be 'MLA' or 'MP'")
+    _check_election_type(election_type)
+    
+    all_results = await compute_all_results(db, election_type)
     
-    all_results = await get_all_results(election_type)
-    party_results = await get_party_wise(election_type)
+    if format == "csv":
+        # Stream rows through csv.writer so names containing commas are quoted
+        return StreamingResponse(
+            _csv_rows(all_results["constituency_results"]),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="results_{election_type}.csv"'}
+        )
+    
+    party_results = await compute_party_wise(db, election_type)
     
     export_data = {
-        "export_timestamp": datetime.utcnow().isoformat(),
+        "export_timestamp": datetime.utcnow(),
         "election_type": election_type,
         "disclaimer": "This is simulated data for academic and research purposes only.",
         "summary": {
@@ -232,67 +240,64 @@ async def export_results(election_type: str, format: str = "json"):
         "constituency_wise": all_results["constituency_results"]
     }
     
-    if format == "csv":
-        # Return CSV-compatible structure
-        csv_rows = ["Constituency,District,Total Votes,Winner,Winner Party"]
-        for r in all_results["constituency_results"]:
-            winner_name = r['winner']['candidate_name'] if r['winner'] else "N/A"
-            winner_party = r['winner']['party'] if r['winner'] else "N/A"
-            csv_rows.append(f"{r['constituency_name']},{r['district']},{r['total_votes']},{winner_name},{winner_party}")
-        
-        return {
-            "format": "csv",
-            "content": "\n".join(csv_rows)
-        }
-    
     return export_data
 
 
+def _csv_rows(constituency_results: list):
+    """Yield the results export one CSV line at a time"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["Constituency", "District", "Total Votes", "Winner", "Winner Party"])
+    
+    for r in constituency_results:
+        winner = r['winner']
+        writer.writerow([
+            r['constituency_name'],
+            r['district'],
+            r['total_votes'],
+            winner['candidate_name'] if winner else "N/A",
+            winner['party'] if winner else "N/A"
+        ])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    
+    # Header only when there are no constituencies
+    if buf.tell():
+        yield buf.getvalue()
+
+
 @router.get("/dashboard/summary")
-async def get_dashboard_summary():
+async def get_dashboard_summary(db: AsyncSession = Depends(get_db)):
     """
     Get summary data for admin dashboard.
     """
-    db = SessionLocal()
-    try:
-        # Count totals
-        total_constituencies = db.query(Constituency).count()
-        total_candidates = db.query(Candidate).count()
-        total_votes = db.query(Vote).count()
-        
-        # Get by election type
-        mla_const = db.query(Constituency).filter(Constituency.election_type == 'MLA').count()
-        mp_const = db.query(Constituency).filter(Constituency.election_type == 'MP').count()
-        
-        mla_votes = db.query(Vote).join(Constituency).filter(
-            Constituency.election_type == 'MLA'
-        ).count()
-        mp_votes = db.query(Vote).join(Constituency).filter(
-            Constituency.election_type == 'MP'
-        ).count()
-        
-        # Quantum channel health
-        channel_health = await get_quantum_channel_health()
-        
-        return {
-            "overview": {
-                "total_constituencies": total_constituencies,
-                "total_candidates": total_candidates,
-                "total_votes": total_votes
-            },
-            "mla_election": {
-                "constituencies": mla_const,
-                "votes_cast": mla_votes
-            },
-            "mp_election": {
-                "constituencies": mp_const,
-                "votes_cast": mp_votes
-            },
-            "quantum_security": {
-                "status": channel_health["channel_status"],
-                "security_rate": channel_health["security_rate"]
-            },
-            "last_updated": datetime.utcnow().isoformat()
-        }
-    finally:
-        db.close()
+    return await compute_dashboard_summary(db)
+
+
+async def compute_dashboard_summary(db: AsyncSession) -> dict:
+    """Admin dashboard overview counts and quantum security status"""
+    counts = await get_dashboard_counts(db)
+    total_sessions = counts["quantum_sessions"]
+    secure_sessions = counts["secure_sessions"]
+    
+    return {
+        "overview": {
+            "total_constituencies": counts["total_constituencies"],
+            "total_candidates": counts["total_candidates"],
+            "total_votes": counts["total_votes"]
+        },
+        "mla_election": {
+            "constituencies": counts["mla_constituencies"],
+            "votes_cast": counts["mla_votes"]
+        },
+        "mp_election": {
+            "constituencies": counts["mp_constituencies"],
+            "votes_cast": counts["mp_votes"]
+        },
+        "quantum_security": {
+            "status": "SECURE" if total_sessions == 0 or secure_sessions == total_sessions else "ALERT",
+            "security_rate": round((secure_sessions / max(total_sessions, 1)) * 100, 2)
+        },
+        "last_updated": datetime.utcnow().isoformat()
+    }
@@ -3,21 +3,37 @@ Voting Routes - Updated for Dual Voting (MLA + MP)
 Privacy-Preserving Quantum Voting System
 """
 
+import re
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from models.database import (
-    SessionLocal, VoterSession, Constituency, Candidate, Vote,
-    get_constituencies_by_type, get_candidates_by_constituency,
-    get_district_vote_summary
+    get_db, get_write_db, insert_vote, mark_session_voted,
+    get_constituencies_by_type, get_candidates_by_constituency, get_constituency,
+    BALLOT_BY_TYPE, load_ballot, get_district_vote_summary, get_total_votes_by_type
 )
 from quantum.encryption import vote_encryption, anonymity_guard
 from quantum.qkd import quantum_key_manager
 
 router = APIRouter(prefix="/voting", tags=["Voting"])
 
+# Receipt codes as issued by AnonymityGuard.generate_anonymous_receipt
+_RECEIPT_CODE_RE = re.compile(r"QV-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}")
+
+# Map legend colors, shared by every district-map response
+PARTY_COLOR_LEGEND = {
+    "TDP": "#FFEB3B",
+    "YSRCP": "#1565C0",
+    "JSP": "#E53935",
+    "BJP": "#FF9933",
+    "INC": "#00BCD4",
+    "IND": "#9E9E9E"
+}
+
 
 class CastVoteRequest(BaseModel):
     """Request to cast a vote (MLA or MP)"""
@@ -36,13 +52,31 @@ class VoteConfirmation(BaseModel):
     voting_complete: bool
 
 
+class BatchVote(BaseModel):
+    """One vote within a batch"""
+    candidate_id: int
+    election_type: str  # 'MLA' or 'MP'
+
+
+class CastVoteBatchRequest(BaseModel):
+    """Request to cast several votes of one session together"""
+    session_id: str
+    votes: List[BatchVote]
+
+
+class VoteBatchConfirmation(BaseModel):
+    """Batch vote confirmation response"""
+    receipts: List[VoteConfirmation]
+    voting_complete: bool
+
+
 @router.get("/constituencies/{election_type}")
-async def get_constituencies(election_type: str):
+async def get_constituencies(election_type: str, db: AsyncSession = Depends(get_db)):
     """Get all constituencies for an election type."""
     if election_type not in ['MLA', 'MP']:
         raise HTTPException(status_code=400, detail="Election type must be 'MLA' or 'MP'")
     
-    constituencies = get_constituencies_by_type(election_type)
+    constituencies = await get_constituencies_by_type(db, election_type)
     
     # Group by district
     by_district = {}
@@ -61,145 +95,153 @@ async def get_constituencies(election_type: str):
 
 
 @router.get("/candidates/{constituency_id}")
-async def get_candidates(constituency_id: int):
+async def get_candidates(constituency_id: int, db: AsyncSession = Depends(get_db)):
     """Get all candidates for a constituency with party colors and 2024 data."""
-    db = SessionLocal()
-    try:
-        constituency = db.query(Constituency).filter(
-            Constituency.id == constituency_id
-        ).first()
-        
-        if not constituency:
-            raise HTTPException(status_code=404, detail="Constituency not found")
-        
-        candidates = get_candidates_by_constituency(constituency_id)
-        
-        return {
-            "constituency": {
-                "id": constituency.id,
-                "name": constituency.name,
-                "district": constituency.district,
-                "election_type": constituency.election_type
-            },
-            "candidates": candidates
-        }
-    finally:
-        db.close()
+    constituency = await get_constituency(db, constituency_id)
+    
+    if not constituency:
+        raise HTTPException(status_code=404, detail="Constituency not found")
+    
+    candidates = await get_candidates_by_constituency(db, constituency_id)
+    
+    return {
+        "constituency": constituency,
+        "candidates": candidates
+    }
+
+
+def _record_vote(db: Session, session_id: str, candidate_id: int, election_type: str) -> VoteConfirmation:
+    """
+    Validate and write one vote inside the caller's transaction.
+    The caller commits, then runs _after_votes_committed.
+    """
+    if election_type not in BALLOT_BY_TYPE:
+        raise HTTPException(status_code=400, detail="Invalid election type")
+    
+    # Session, its constituency for this election and the candidate check
+    # come back from one joined query
+    ballot = load_ballot(db, session_id, candidate_id, election_type)
+    
+    if not ballot:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    if ballot.expires_at and ballot.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=400, detail="Session has expired")
+    
+    if not ballot.quantum_key:
+        raise HTTPException(status_code=400, detail="Quantum key not generated")
+    
+    # Check if already voted for this election type
+    if ballot.already_voted:
+        raise HTTPException(status_code=400, detail=f"Already voted for {election_type}")
+    
+    expected_const_id = ballot.constituency_id
+    if not expected_const_id:
+        raise HTTPException(status_code=400, detail=f"No {election_type} constituency selected")
+    
+    # Validate candidate
+    if not ballot.candidate_ok:
+        raise HTTPException(status_code=400, detail="Invalid candidate for selected constituency")
+    
+    # Prepare and encrypt vote
+    # Bound here rather than left to server_default: it is part of the encrypted payload
+    timestamp = datetime.utcnow()
+    vote_data = {
+        "constituency_id": expected_const_id,
+        "candidate_id": candidate_id,
+        "timestamp": timestamp.isoformat()
+    }
+    
+    encrypted = vote_encryption.encrypt_vote(vote_data, ballot.quantum_key)
+    
+    # Store vote; the unique vote_hash makes the insert its own duplicate check
+    vote_id = insert_vote(
+        db,
+        constituency_id=expected_const_id,
+        candidate_id=candidate_id,
+        encrypted_vote=encrypted.encrypted_vote,
+        vote_hash=encrypted.vote_hash,
+        timestamp=timestamp
+    )
+    
+    if vote_id is None:
+        raise HTTPException(status_code=400, detail="Duplicate vote detected")
+    
+    # Update session in the same transaction as the insert
+    voting_complete = mark_session_voted(db, session_id, election_type)
+    
+    if voting_complete is None:
+        raise HTTPException(status_code=400, detail=f"Already voted for {election_type}")
+    
+    receipt_code = anonymity_guard.generate_anonymous_receipt(encrypted.vote_hash)
+    
+    return VoteConfirmation(
+        success=True,
+        election_type=election_type,
+        receipt_code=receipt_code,
+        message=f"Your {election_type} vote has been securely recorded.",
+        timestamp=timestamp.isoformat(),
+        voting_complete=voting_complete
+    )
+
+
+def _after_votes_committed(session_id: str, voting_complete: bool):
+    """Drop the session key once both votes are in"""
+    # Cached results need no action: the vote insert trigger bumps the results epoch
+    if voting_complete:
+        quantum_key_manager.invalidate_session(session_id)
 
 
 @router.post("/cast", response_model=VoteConfirmation)
-async def cast_vote(request: CastVoteRequest):
+def cast_vote(request: CastVoteRequest, db: Session = Depends(get_write_db)):
     """
     Cast a vote for either MLA or MP election.
     Supports dual voting - can vote for both in same session.
     """
-    db = SessionLocal()
     try:
-        # Validate session
-        session = db.query(VoterSession).filter(
-            VoterSession.session_id == request.session_id
-        ).first()
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        if session.expires_at and session.expires_at < datetime.utcnow():
-            raise HTTPException(status_code=400, detail="Session has expired")
-        
-        if not session.quantum_key:
-            raise HTTPException(status_code=400, detail="Quantum key not generated")
-        
-        # Check if already voted for this election type
-        if request.election_type == 'MLA':
-            if session.has_voted_mla:
-                raise HTTPException(status_code=400, detail="Already voted for MLA")
-            expected_const_id = session.mla_constituency_id
-        elif request.election_type == 'MP':
-            if session.has_voted_mp:
-                raise HTTPException(status_code=400, detail="Already voted for MP")
-            expected_const_id = session.mp_constituency_id
-        else:
-            raise HTTPException(status_code=400, detail="Invalid election type")
-        
-        if not expected_const_id:
-            raise HTTPException(status_code=400, detail=f"No {request.election_type} constituency selected")
-        
-        # Validate candidate
-        candidate = db.query(Candidate).filter(
-            Candidate.id == request.candidate_id,
-            Candidate.constituency_id == expected_const_id
-        ).first()
-        
-        if not candidate:
-            raise HTTPException(status_code=400, detail="Invalid candidate for selected constituency")
-        
-        # Prepare and encrypt vote
-        timestamp = datetime.utcnow()
-        vote_data = {
-            "constituency_id": expected_const_id,
-            "candidate_id": request.candidate_id,
-            "timestamp": timestamp.isoformat()
-        }
-        
-        encrypted_result = vote_encryption.encrypt_vote(vote_data, session.quantum_key)
-        
-        # Check for duplicate
-        existing_vote = db.query(Vote).filter(
-            Vote.vote_hash == encrypted_result['vote_hash']
-        ).first()
-        
-        if existing_vote:
-            raise HTTPException(status_code=400, detail="Duplicate vote detected")
-        
-        # Store vote
-        vote = Vote(
-            constituency_id=expected_const_id,
-            candidate_id=request.candidate_id,
-            encrypted_vote=encrypted_result['encrypted_vote'],
-            vote_hash=encrypted_result['vote_hash'],
-            timestamp=timestamp
-        )
-        db.add(vote)
-        
-        # Update session
-        if request.election_type == 'MLA':
-            session.has_voted_mla = True
-        else:
-            session.has_voted_mp = True
-        
-        voting_complete = session.has_voted_mla and session.has_voted_mp
-        
-        # Clear quantum key only if both votes cast
-        if voting_complete:
-            session.quantum_key = None
-            quantum_key_manager.invalidate_session(request.session_id)
-        
+        confirmation = _record_vote(db, request.session_id, request.candidate_id, request.election_type)
         db.commit()
-        
-        receipt_code = anonymity_guard.generate_anonymous_receipt(encrypted_result['vote_hash'])
-        
-        return VoteConfirmation(
-            success=True,
-            election_type=request.election_type,
-            receipt_code=receipt_code,
-            message=f"Your {request.election_type} vote has been securely recorded.",
-            timestamp=timestamp.isoformat(),
-            voting_complete=voting_complete
-        )
+        _after_votes_committed(request.session_id, confirmation.voting_complete)
+        return confirmation
         
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error casting vote: {str(e)}")
-    finally:
-        db.close()
+
+
+@router.post("/cast-batch", response_model=VoteBatchConfirmation)
+def cast_vote_batch(request: CastVoteBatchRequest, db: Session = Depends(get_write_db)):
+    """
+    Cast the MLA and MP votes of a session in one request.
+    Both votes are written in a single transaction: either all are recorded or none.
+    """
+    election_types = [vote.election_type for vote in request.votes]
+    if not election_types or len(set(election_types)) != len(election_types):
+        raise HTTPException(status_code=400, detail="Each election type can be voted for at most once per batch")
+    
+    try:
+        receipts = [
+            _record_vote(db, request.session_id, vote.candidate_id, vote.election_type)
+            for vote in request.votes
+        ]
+        db.commit()
+        voting_complete = receipts[-1].voting_complete
+        _after_votes_committed(request.session_id, voting_complete)
+        return VoteBatchConfirmation(receipts=receipts, voting_complete=voting_complete)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error casting votes: {str(e)}")
 
 
 @router.get("/verify/{receipt_code}")
 async def verify_vote(receipt_code: str):
     """Verify that a vote was recorded."""
-    if not receipt_code.startswith("QV-") or len(receipt_code) != 16:
+    if not _RECEIPT_CODE_RE.fullmatch(receipt_code):
         return {"valid_format": False, "message": "Invalid receipt code format"}
     
     return {
@@ -209,41 +251,25 @@ async def verify_vote(receipt_code: str):
 
 
 @router.get("/stats/turnout")
-async def get_turnout_stats():
+async def get_turnout_stats(db: AsyncSession = Depends(get_db)):
     """Get voting turnout statistics"""
-    db = SessionLocal()
-    try:
-        mla_votes = db.query(Vote).join(Constituency).filter(
-            Constituency.election_type == 'MLA'
-        ).count()
-        
-        mp_votes = db.query(Vote).join(Constituency).filter(
-            Constituency.election_type == 'MP'
-        ).count()
-        
-        return {
-            "mla": {"total_votes": mla_votes},
-            "mp": {"total_votes": mp_votes},
-            "total_votes": mla_votes + mp_votes
-        }
-    finally:
-        db.close()
+    mla_votes = await get_total_votes_by_type(db, 'MLA')
+    mp_votes = await get_total_votes_by_type(db, 'MP')
+    
+    return {
+        "mla": {"total_votes": mla_votes},
+        "mp": {"total_votes": mp_votes},
+        "total_votes": mla_votes + mp_votes
+    }
 
 
 @router.get("/realtime/district-map")
-async def get_realtime_district_map():
+async def get_realtime_district_map(db: AsyncSession = Depends(get_db)):
     """Get real-time district-wise voting data for map visualization"""
-    summary = get_district_vote_summary()
+    summary = await get_district_vote_summary(db)
     
     return {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
         "districts": summary,
-        "color_legend": {
-            "TDP": "#FFEB3B",
-            "YSRCP": "#1565C0",
-            "JSP": "#E53935",
-            "BJP": "#FF9933",
-            "INC": "#00BCD4",
-            "IND": "#9E9E9E"
-        }
+        "color_legend": PARTY_COLOR_LEGEND
     }
@@ -1,85 +1,135 @@
-import requests
-import json
+import asyncio
+import sys
+import httpx
+import orjson
 import time
 
 BASE_URL = "http://localhost:8000/api"
+JSON_HEADERS = {"Content-Type": "application/json"}
+MAX_CONNECTIONS = 200
+
+# Endpoints are built once; only path/query parameters are filled per voter
+URL_CREATE_SESSION = BASE_URL + "/auth/session/create"
+URL_SELECT_CONSTITUENCIES = BASE_URL + "/auth/session/select-constituencies"
+URL_GENERATE_KEY_TPL = BASE_URL + "/auth/quantum/generate-key?session_id={}&simulate_attack=false"
+URL_CANDIDATES_TPL = BASE_URL + "/voting/candidates/{}"
+URL_CAST_BATCH = BASE_URL + "/voting/cast-batch"
+
+# Every simulated voter is in Guntur: Guntur West (MLA) and Guntur (MP)
+DISTRICT = "Guntur"
+MLA_ID = 88
+MP_ID = 213
+CREATE_SESSION_BODY = orjson.dumps({"district": DISTRICT})
+URL_MLA_CANDIDATES = URL_CANDIDATES_TPL.format(MLA_ID)
+URL_MP_CANDIDATES = URL_CANDIDATES_TPL.format(MP_ID)
+
+
+async def post_json(client, url, payload):
+    """POST a body encoded with orjson instead of httpx's stdlib json"""
+    return await client.post(url, content=orjson.dumps(payload), headers=JSON_HEADERS)
+
+
+async def simulate_one(client, idx, verbose=False):
+    """Run one voter end-to-end; returns True if both votes were recorded"""
+    log = print if verbose else (lambda *args: None)
 
-def simulate_full_vote():
-    print("🚀 Starting Vote Simulation...")
-    
     # 1. Create Session
-    print("\n1. Creating Session...")
-    res = requests.post(f"{BASE_URL}/auth/session/create", json={"district": "Guntur"})
+    log("\n1. Creating Session...")
+    res = await client.post(URL_CREATE_SESSION, content=CREATE_SESSION_BODY, headers=JSON_HEADERS)
     if res.status_code != 200:
-        print(f"Failed to create session: {res.text}")
-        return
-    session_data = res.json()
+        print(f"[voter {idx}] Failed to create session: {res.text}")
+        return False
+    session_data = orjson.loads(res.content)
     session_id = session_data['session_id']
-    print(f"Session Created: {session_id[:10]}...")
-    
+    log(f"Session Created: {session_id[:10]}...")
+
     # 2. Select Constituencies
-    # Finding Guntur West (MLA) and Guntur (MP)
-    mla_id = 88 # Guntur West
-    mp_id = 213 # Guntur
-    
-    print("\n2. Selecting Constituencies...")
+    log("\n2. Selecting Constituencies...")
     payload = {
         "session_id": session_id,
-        "mla_constituency_id": mla_id,
-        "mp_constituency_id": mp_id
+        "mla_constituency_id": MLA_ID,
+        "mp_constituency_id": MP_ID
     }
-    res = requests.post(f"{BASE_URL}/auth/session/select-constituencies", json=payload)
+    res = await post_json(client, URL_SELECT_CONSTITUENCIES, payload)
     if res.status_code != 200:
-        print(f"Constituency selection failed: {res.text}")
-        return
-    print("Constituencies Selected (Guntur West + Guntur MP)")
-    
+        print(f"[voter {idx}] Constituency selection failed: {res.text}")
+        return False
+    log("Constituencies Selected (Guntur West + Guntur MP)")
+
     # 3. Generate Quantum Key
-    print("\n3. Generating Quantum Key...")
-    res = requests.post(f"{BASE_URL}/auth/quantum/generate-key?session_id={session_id}&simulate_attack=false")
+    log("\n3. Generating Quantum Key...")
+    res = await client.post(URL_GENERATE_KEY_TPL.format(session_id))
     if res.status_code != 200:
-        print(f"Key generation failed: {res.text}")
-        return
-    print("Quantum Key Generated")
-    
+        print(f"[voter {idx}] Key generation failed: {res.text}")
+        return False
+    log("Quantum Key Generated")
+
     # 4. Get Candidates to Vote For
-    print("\n4. Fetching Candidates...")
-    res_candidates = requests.get(f"{BASE_URL}/voting/candidates/{mla_id}")
-    mla_cand = res_candidates.json()['candidates'][0] # Vote for first candidate (likely TDP)
-    print(f"Selected MLA Candidate: {mla_cand['name']} ({mla_cand['party']})")
-    
-    res_candidates_mp = requests.get(f"{BASE_URL}/voting/candidates/{mp_id}")
-    mp_cand = res_candidates_mp.json()['candidates'][0] # Vote for first candidate
-    print(f"Selected MP Candidate: {mp_cand['name']} ({mp_cand['party']})")
-    
+    log("\n4. Fetching Candidates...")
+    # The two lists are independent, so fetch them concurrently
+    res_candidates, res_candidates_mp = await asyncio.gather(
+        client.get(URL_MLA_CANDIDATES),
+        client.get(URL_MP_CANDIDATES)
+    )
+    for res in (res_candidates, res_candidates_mp):
+        if res.status_code != 200:
+            print(f"[voter {idx}] Fetching candidates failed: {res.text}")
+            return False
+
+    mla_cand = orjson.loads(res_candidates.content)['candidates'][0] # Vote for first candidate (likely TDP)
+    log(f"Selected MLA Candidate: {mla_cand['name']} ({mla_cand['party']})")
+
+    mp_cand = orjson.loads(res_candidates_mp.content)['candidates'][0] # Vote for first candidate
+    log(f"Selected MP Candidate: {mp_cand['name']} ({mp_cand['party']})")
+
     # 5. Cast Votes
-    print("\n5. Casting Votes...")
-    
-    # MLA Vote
+    log("\n5. Casting Votes...")
+
+    # Both votes in one request, recorded in a single transaction
     vote_data_mla = {
-        "session_id": session_id,
         "candidate_id": mla_cand['id'],
         "election_type": "MLA"
     }
-    res = requests.post(f"{BASE_URL}/voting/cast", json=vote_data_mla)
-    if res.status_code != 200:
-        print(f"MLA Vote failed: {res.text}")
-        return
-    print(f"MLA Vote Cast! Receipt: {res.json()['receipt_code']}")
-    
-    # MP Vote
     vote_data_mp = {
-        "session_id": session_id,
         "candidate_id": mp_cand['id'],
         "election_type": "MP"
     }
-    res = requests.post(f"{BASE_URL}/voting/cast", json=vote_data_mp)
+    res = await post_json(client, URL_CAST_BATCH,
+                          {"session_id": session_id, "votes": [vote_data_mla, vote_data_mp]})
     if res.status_code != 200:
-        print(f"MP Vote failed: {res.text}")
-        return
-    print(f"MP Vote Cast! Receipt: {res.json()['receipt_code']}")
-    
-    print("\n✅ VOTING SIMULATION COMPLETE SUCCESS")
+        print(f"[voter {idx}] Voting failed: {res.text}")
+        return False
+    for receipt in orjson.loads(res.content)['receipts']:
+        log(f"{receipt['election_type']} Vote Cast! Receipt: {receipt['receipt_code']}")
+
+    return True
+
+
+async def main(n=1):
+    """Simulate n voters concurrently over one shared connection pool"""
+    print(f"🚀 Starting Vote Simulation ({n} voter{'s' if n != 1 else ''})...")
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(simulate_one(client, i, verbose=(n == 1)) for i in range(n)),
+            return_exceptions=True
+        )
+        elapsed = time.perf_counter() - start
+
+    ok = sum(1 for r in results if r is True)
+    for i, r in enumerate(results):
+        if isinstance(r, Exception):
+            print(f"[voter {i}] Error: {r!r}")
+
+    if ok == n:
+        print(f"\n✅ VOTING SIMULATION COMPLETE SUCCESS ({ok}/{n} voters in {elapsed:.2f}s)")
+    else:
+        print(f"\n❌ VOTING SIMULATION FAILED ({ok}/{n} voters succeeded in {elapsed:.2f}s)")
+    return ok == n
+
 
 if __name__ == "__main__":
-    simulate_full_vote()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    sys.exit(0 if asyncio.run(main(n)) else 1)
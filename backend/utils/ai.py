@@ -1,73 +1,218 @@
+import asyncio
+import hashlib
 import os
+import re
+import time
 import httpx
-from typing import Dict, Any
+import orjson
+from cachetools import TTLCache
+from typing import Dict, Any, List, Tuple
+
+# Static prompt text, so a request only joins in its own data
+_INSIGHT_PROMPT_PREFIX = """
+Analyze the following real-time election data from the Andhra Pradesh 2024 simulation and provide 3-4 professional, concise insights for an admin dashboard.
+Focus on:
+1. Leading trends
+2. District participation patterns
+3. Predicted outcomes based on current momentum
+4. Security health (Quantum encrypted channel status)
+
+Data:
+"""
+
+_INSIGHT_PROMPT_SUFFIX = """
+
+Return the insights as a bulleted list in markdown format. Keep it concise and academic.
+"""
+
+_CANDIDATE_NAMES_PROMPT = (
+    "Generate {count} realistic fictional South Indian politician names for the constituency "
+    "'{constituency}' in Andhra Pradesh representing these parties: {parties}. "
+    "Return ONLY the names as a comma-separated list, nothing else."
+)
+
+# Comma-separated names, tolerating stray whitespace and markdown list
+# markers around the reply
+_NAME_SPLIT_RE = re.compile(r"\s*,\s*")
+_NAME_LIST_EDGES = " \n\r\t*-"
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Insights are requested while an admin dashboard waits, so a slow Gemini
+# reply fails fast and is retried once after a short backoff
+_INSIGHT_TIMEOUT = httpx.Timeout(connect=3.0, read=8.0, write=5.0, pool=2.0)
+_INSIGHT_ATTEMPTS = 2
+_INSIGHT_BACKOFF = 0.2
+
+_INSIGHTS_DISABLED = orjson.dumps(
+    "AI Insights are currently disabled. Please provide a Gemini API key to enable real-time election analysis."
+)
+
+
+def _request_body(prompt: str) -> bytes:
+    """Encode a single-prompt generateContent request body"""
+    return orjson.dumps({"contents": [{"parts": [{"text": prompt}]}]})
+
+
+def _insight_signature(election_data: Dict[str, Any]) -> tuple:
+    """Cheap fingerprint of the dashboard summary fields insights depend on most"""
+    overview = election_data.get("overview", {})
+    security = election_data.get("quantum_security", {})
+    return (
+        overview.get("total_votes"),
+        security.get("status"),
+        security.get("security_rate"),
+        int(time.monotonic() // 30)
+    )
+
+
+def _response_text(content: bytes) -> str:
+    """Pull the generated text out of a raw generateContent response body"""
+    return orjson.loads(content)['candidates'][0]['content']['parts'][0]['text']
+
 
 class GeminiClient:
     """Client for interacting with Google Gemini API"""
     
+    # Upper bound on concurrent requests from bulk helpers (API rate limits)
+    MAX_CONCURRENT_REQUESTS = 20
+    
     def __init__(self, api_key: str = None):
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
         self.model = "gemini-2.5-flash"
         self.endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        self._client = None
+        # Insights per election-data digest; concurrent misses for the same
+        # digest wait on one upstream call instead of each calling Gemini
+        self._insight_cache = TTLCache(maxsize=128, ttl=30)
+        self._insight_locks: Dict[str, asyncio.Lock] = {}
+        # Signature and text of the last successful insights, checked before hashing
+        self._last_insight_sig = None
+        self._last_insight_text = None
 
-    async def generate_insights(self, election_data: Dict[str, Any]) -> str:
-        """Generate AI insights based on provided election data"""
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client, created on first use so it binds to the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+                timeout=httpx.Timeout(30.0, connect=5.0)
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close the shared client (called on application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def generate_insights(self, election_data: Dict[str, Any]) -> bytes:
+        """
+        Generate AI insights based on provided election data.
+        Returns the insights text already encoded as a JSON string, so cached
+        insights are encoded once and spliced straight into responses.
+        """
         if not self.api_key:
-            return "AI Insights are currently disabled. Please provide a Gemini API key to enable real-time election analysis."
+            return _INSIGHTS_DISABLED
 
-        prompt = f"""
-        Analyze the following real-time election data from the Andhra Pradesh 2024 simulation and provide 3-4 professional, concise insights for an admin dashboard.
-        Focus on:
-        1. Leading trends
-        2. District participation patterns
-        3. Predicted outcomes based on current momentum
-        4. Security health (Quantum encrypted channel status)
+        # Dashboards poll much faster than the headline numbers move: within a
+        # 30 second window, same votes and security state means same insights
+        sig = _insight_signature(election_data)
+        if sig == self._last_insight_sig and self._last_insight_text:
+            return self._last_insight_text
 
-        Data:
-        {election_data}
+        # last_updated changes on every call without changing the data
+        key = hashlib.sha256(orjson.dumps(
+            {k: v for k, v in election_data.items() if k != "last_updated"},
+            option=orjson.OPT_SORT_KEYS, default=str
+        )).hexdigest()
+        insights = self._insight_cache.get(key)
+        if insights is not None:
+            return insights
 
-        Return the insights as a bulleted list in markdown format. Keep it concise and academic.
-        """
+        lock = self._insight_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                insights = self._insight_cache.get(key)
+                if insights is None:
+                    text, ok = await self._request_insights(election_data)
+                    insights = orjson.dumps(text)
+                    if not ok:
+                        # Keep showing the last good insights rather than an error
+                        return self._last_insight_text or insights
+                    self._insight_cache[key] = insights
+                self._last_insight_sig, self._last_insight_text = sig, insights
+                return insights
+        finally:
+            if not lock.locked() and self._insight_locks.get(key) is lock:
+                del self._insight_locks[key]
+
+    async def _request_insights(self, election_data: Dict[str, Any]) -> Tuple[str, bool]:
+        """Call Gemini for insights; returns (text, succeeded)"""
+        # Compact JSON is cheaper to build than the dict repr and costs fewer tokens
+        data_json = orjson.dumps(election_data, default=str).decode()
+        prompt = _INSIGHT_PROMPT_PREFIX + data_json + _INSIGHT_PROMPT_SUFFIX
+
+        body = _request_body(prompt)
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.endpoint}?key={self.api_key}",
-                    json={
-                        "contents": [{
-                            "parts": [{"text": prompt}]
-                        }]
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    return response.json()['candidates'][0]['content']['parts'][0]['text']
-                else:
-                    return f"Error generating insights: {response.text}"
+            # Only timeouts are retried; other failures are not transient enough
+            for attempt in range(_INSIGHT_ATTEMPTS):
+                try:
+                    response = await self._get_client().post(
+                        f"{self.endpoint}?key={self.api_key}",
+                        content=body,
+                        headers=_JSON_HEADERS,
+                        timeout=_INSIGHT_TIMEOUT
+                    )
+                    break
+                except httpx.TimeoutException:
+                    if attempt == _INSIGHT_ATTEMPTS - 1:
+                        raise
+                    await asyncio.sleep(_INSIGHT_BACKOFF * 2 ** attempt)
+            
+            if response.status_code == 200:
+                return _response_text(response.content), True
+            else:
+                return f"Error generating insights: {response.text}", False
         except Exception as e:
-            return f"AI Analysis temporarily unavailable: {str(e)}"
+            return f"AI Analysis temporarily unavailable: {str(e)}", False
 
     async def generate_candidate_names(self, constituency: str, parties: list) -> list:
         """Generate realistic candidate names for a constituency"""
-        if not self.api_key:
+        if not self.api_key or not parties:
             return []
             
-        party_str = ", ".join(parties)
-        prompt = f"Generate {len(parties)} realistic fictional South Indian politician names for the constituency '{constituency}' in Andhra Pradesh representing these parties: {party_str}. Return ONLY the names as a comma-separated list, nothing else."
+        prompt = _CANDIDATE_NAMES_PROMPT.format(
+            count=len(parties), constituency=constituency, parties=", ".join(parties)
+        )
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.endpoint}?key={self.api_key}",
-                    json={"contents": [{"parts": [{"text": prompt}]}]},
-                    timeout=5.0
-                )
-                if response.status_code == 200:
-                    text = response.json()['candidates'][0]['content']['parts'][0]['text']
-                    return [name.strip() for name in text.split(',')]
-        except:
-            return []
+            response = await self._get_client().post(
+                f"{self.endpoint}?key={self.api_key}",
+                content=_request_body(prompt),
+                headers=_JSON_HEADERS,
+                timeout=5.0
+            )
+            if response.status_code == 200:
+                names = _NAME_SPLIT_RE.split(_response_text(response.content).strip(_NAME_LIST_EDGES))
+                return [name for name in names if name]
+        except Exception:
+            pass
+        return []
+
+    async def generate_candidate_names_bulk(self, items: List[Tuple[str, list]]) -> List[list]:
+        """
+        Generate names for many (constituency, parties) pairs concurrently,
+        with at most MAX_CONCURRENT_REQUESTS in flight. Results keep input order;
+        a failed constituency gets an empty list.
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+        async def generate_one(constituency: str, parties: list) -> list:
+            async with semaphore:
+                return await self.generate_candidate_names(constituency, parties)
+
+        return await asyncio.gather(*(generate_one(c, p) for c, p in items))
 
 # Singleton instance
 gemini_client = GeminiClient()
@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import threading
+from cachetools import TTLCache
+
+# Every cache key includes an epoch, so entries computed before a change are
+# never served after it. The epochs live in the database (the cache_epochs
+# row in models.database) rather than in this process, so a vote or reseed
+# handled by one worker invalidates the caches of all of them:
+# - the results epoch is bumped by a trigger on every inserted vote;
+# - both are bumped after the database is reseeded.
+# A session reads them once, on its first cached lookup, and keeps them in
+# its info dict for the rest of the request.
+_EPOCHS_KEY = "cache_epochs"
+
+
+async def load_cache_epochs(db) -> tuple:
+    """Get the (results, reference) epochs for this session"""
+    from models.database import CACHE_EPOCHS
+    
+    epochs = db.info.get(_EPOCHS_KEY)
+    if epochs is None:
+        epochs = db.info[_EPOCHS_KEY] = tuple((await db.execute(CACHE_EPOCHS)).one())
+    return epochs
+
+
+def load_cache_epochs_sync(db) -> tuple:
+    """Get the (results, reference) epochs for this session (sync)"""
+    from models.database import CACHE_EPOCHS
+    
+    epochs = db.info.get(_EPOCHS_KEY)
+    if epochs is None:
+        epochs = db.info[_EPOCHS_KEY] = tuple(db.execute(CACHE_EPOCHS).one())
+    return epochs
+
+
+def results_cache(ttl: float = 3, maxsize: int = 64):
+    """
+    Cache an async read helper for a few seconds.
+    The wrapped helper takes the session as its first argument, which is
+    left out of the key. Cached values are shared between requests, so
+    callers must not mutate them.
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        lock = asyncio.Lock()
+
+        @functools.wraps(func)
+        async def wrapper(db, *args, **kwargs):
+            results_epoch, _ = await load_cache_epochs(db)
+            key = (results_epoch, args, tuple(sorted(kwargs.items())))
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+            # Concurrent misses wait for the first caller instead of all querying
+            async with lock:
+                value = cache.get(key)
+                if value is None:
+                    value = await func(db, *args, **kwargs)
+                    cache[key] = value
+            return value
+
+        return wrapper
+    return decorator
+
+
+def reference_cache(ttl: float = 300, maxsize: int = 1024):
+    """
+    Cache a reference-data lookup for a few minutes.
+    Works like results_cache but is only invalidated on reseed, and also
+    wraps plain (sync) helpers used from threadpool handlers.
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        if not asyncio.iscoroutinefunction(func):
+            lock = threading.Lock()
+
+            @functools.wraps(func)
+            def sync_wrapper(db, *args):
+                key = (load_cache_epochs_sync(db)[1], args)
+                with lock:
+                    value = cache.get(key)
+                if value is None:
+                    value = func(db, *args)
+                    with lock:
+                        cache[key] = value
+                return value
+
+            def sync_prime(db, value, *args):
+                with lock:
+                    cache[(db.info[_EPOCHS_KEY][1], args)] = value
+
+            sync_wrapper.prime = sync_prime
+            return sync_wrapper
+
+        lock = asyncio.Lock()
+
+        @functools.wraps(func)
+        async def wrapper(db, *args):
+            _, reference_epoch = await load_cache_epochs(db)
+            key = (reference_epoch, args)
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+            async with lock:
+                value = cache.get(key)
+                if value is None:
+                    value = await func(db, *args)
+                    cache[key] = value
+            return value
+
+        def prime(db, value, *args):
+            """
+            Store a value fetched elsewhere, e.g. by a bulk warm-up query.
+            db must already have loaded its epochs (see load_cache_epochs).
+            """
+            cache[(db.info[_EPOCHS_KEY][1], args)] = value
+
+        wrapper.prime = prime
+        return wrapper
+    return decorator